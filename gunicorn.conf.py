@@ -0,0 +1,17 @@
+# Gunicorn configuration for serving the dashboard and API in production:
+#   gunicorn -c gunicorn.conf.py src.api.wsgi:application
+# The scheduler runs separately (python main.py scheduler).
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+# Requests spend most of their time waiting on the database; gevent workers
+# let one worker keep serving other requests during those waits. Concurrency comes
+# from greenlets, so a few workers suffice (the 2 x CPUs + 1 rule is for sync workers),
+# and each one holds its own database pool (see DB_POOL_SIZE).
+workers = int(os.getenv('WEB_WORKERS', 2))
+worker_class = 'gevent'
+worker_connections = 1000
+timeout = 30
+# preload_app stays off: gevent must monkey-patch each worker before the app
+# (requests, SQLAlchemy's pool) is imported, which preloading in the master would defeat.
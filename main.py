@@ -1,9 +1,19 @@
 import argparse
 import logging
+import multiprocessing
 import os
+import re
+import signal
 import sys
 import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
+
+from sqlalchemy import bindparam, insert, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload
 
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
@@ -11,180 +21,299 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src'
 from src.utils.config_loader import ConfigLoader
 from src.database.connection import init_db, db_session
 from src.database.models import Base, Agency, Form, Change
-from src.monitors.web_scraper import WebScraper
-from src.monitors.change_detector import ChangeDetector
-from src.notifications.notifier import Notifier
-from src.scheduler.monitoring_scheduler import MonitoringScheduler
-from src.api.main import app as flask_app # Import Flask app and setters
+# Scraper, notifier, scheduler and Flask app are imported inside the commands that use them
+# so that e.g. init-db doesn't pay for loading Selenium, APScheduler or Flask.
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Number of monitored forms to accumulate before committing to the database
+COMMIT_BATCH_SIZE = 25
+
 config_loader = ConfigLoader()
 app_config = config_loader.get_config()
 
+def _insert_ignoring_conflicts(session, model):
+    """Returns an INSERT for model's table that skips rows violating a unique constraint."""
+    # Only SQLite (development) and PostgreSQL (production) are supported backends
+    if session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model.__table__).on_conflict_do_nothing()
+
 def load_agency_data():
     """Loads agency and form data from config/agencies.yaml into the database."""
     logger.info("Loading agency and form data...")
-    federal_agencies_config = app_config.get('federal', {})
-    state_agencies_config = app_config.get('states', {})
+    agencies_config = config_loader.get_agencies()
 
     with db_session() as session:
-        # Process Federal Agencies
-        for agency_key, agency_data in federal_agencies_config.items():
-            agency = session.query(Agency).filter_by(name=agency_data['name']).first()
-            if not agency:
-                agency = Agency(
-                    name=agency_data['name'],
-                    base_url=agency_data.get('base_url'),
-                    phone=agency_data.get('contact', {}).get('phone'),
-                    email=agency_data.get('contact', {}).get('email')
-                )
-                session.add(agency)
-                session.flush() # To get agency.id
-
-            for form_data in agency_data.get('forms', []):
-                form = session.query(Form).filter_by(agency_id=agency.id, name=form_data['name']).first()
-                if not form:
-                    form = Form(
-                        agency_id=agency.id,
-                        name=form_data['name'],
-                        title=form_data.get('title'),
-                        url=form_data['url'],
-                        form_url=form_data.get('form_url'),
-                        instructions_url=form_data.get('instructions_url'),
-                        check_frequency=form_data.get('check_frequency', app_config.get('monitoring_settings', {}).get('default_check_frequency')),
-                        contact_email=form_data.get('contact_email')
-                    )
-                    session.add(form)
-        
-        # Process State Agencies
-        for agency_key, agency_data in state_agencies_config.items():
-            agency = session.query(Agency).filter_by(name=agency_data['name']).first()
-            if not agency:
-                agency = Agency(
-                    name=agency_data['name'],
-                    abbreviation=agency_data.get('abbreviation'),
-                    base_url=agency_data.get('base_url'),
-                    prevailing_wage_url=agency_data.get('prevailing_wage_url'),
-                    phone=agency_data.get('contact', {}).get('phone'),
-                    email=agency_data.get('contact', {}).get('email')
-                )
-                session.add(agency)
-                session.flush() # To get agency.id
-
-            for form_data in agency_data.get('forms', []):
-                form = session.query(Form).filter_by(agency_id=agency.id, name=form_data['name']).first()
-                if not form:
-                    form = Form(
-                        agency_id=agency.id,
-                        name=form_data['name'],
-                        title=form_data.get('title'),
-                        url=form_data['url'],
-                        form_url=form_data.get('form_url'),
-                        instructions_url=form_data.get('instructions_url'),
-                        check_frequency=form_data.get('check_frequency', app_config.get('monitoring_settings', {}).get('default_check_frequency')),
-                        contact_email=form_data.get('contact_email')
-                    )
-                    session.add(form)
+        # Agency names are unique, so existing agencies are skipped by the database itself
+        agency_rows = [
+            {
+                'name': agency_config.name,
+                'abbreviation': agency_config.abbreviation,
+                'base_url': agency_config.base_url,
+                'prevailing_wage_url': agency_config.prevailing_wage_url,
+                'phone': agency_config.phone,
+                'email': agency_config.email
+            }
+            for agency_config in agencies_config
+        ]
+        if agency_rows:
+            session.execute(_insert_ignoring_conflicts(session, Agency), agency_rows)
+        agency_ids = dict(session.query(Agency.name, Agency.id))
+
+        # Existing forms are still filtered here: databases created before the
+        # (agency_id, name) unique index was added won't reject duplicates themselves.
+        existing_forms = {(agency_id, name) for agency_id, name in session.query(Form.agency_id, Form.name)}
+        form_rows = []
+        for agency_config in agencies_config:
+            agency_id = agency_ids[agency_config.name]
+            for form_config in agency_config.forms:
+                if (agency_id, form_config.name) in existing_forms:
+                    continue
+                existing_forms.add((agency_id, form_config.name))
+                form_rows.append({
+                    'agency_id': agency_id,
+                    'name': form_config.name,
+                    'title': form_config.title,
+                    'url': form_config.url,
+                    'form_url': form_config.form_url,
+                    'instructions_url': form_config.instructions_url,
+                    'check_frequency': form_config.check_frequency,
+                    'contact_email': form_config.contact_email
+                })
+        if form_rows:
+            session.execute(_insert_ignoring_conflicts(session, Form), form_rows)
+    logger.info("Agency and form data loaded successfully: %d agencies configured, %d new forms added.",
+                len(agencies_config), len(form_rows))
+
+# Single-pass scan for the keywords classify_severity looks for
+SEVERITY_KEYWORD_PATTERN = re.compile(r'critical|major|significant', re.IGNORECASE)
+
+# Executemany statement used to write back scrape results for a batch of forms
+FORM_SCRAPE_UPDATE = (
+    update(Form.__table__)
+    .where(Form.__table__.c.id == bindparam('form_id'))
+    .values(last_hash=bindparam('new_hash'), last_scraped_at=bindparam('scraped_at'))
+)
+
+def _write_scrape_results(session, form_updates, new_changes):
+    """Executes the form updates and change inserts for some scrape results; returns the new change ids."""
+    if form_updates:
+        session.execute(FORM_SCRAPE_UPDATE, form_updates)
+    if not new_changes:
+        return []
+    # One bulk INSERT for the batch instead of a unit-of-work flush per Change object
+    return list(session.scalars(insert(Change).returning(Change.id), new_changes))
+
+def _write_monitoring_batch(session, notifier, form_updates, new_changes):
+    """
+    Writes a batch of scrape results (form updates and new change rows) in one commit,
+    then queues alerts for its changes. If the batched statements fail, the results are
+    written again one form per SAVEPOINT, so a bad row only loses its own form's results.
+    """
+    try:
+        try:
+            with session.begin_nested():
+                change_ids = _write_scrape_results(session, form_updates, new_changes)
+        except SQLAlchemyError as e:
+            logger.warning("Batched save of %s form results failed (%s); saving them one form at a time.",
+                           len(form_updates), e)
+            change_ids = []
+            changes_by_form = {change['form_id']: change for change in new_changes}
+            for form_update in form_updates:
+                change = changes_by_form.get(form_update['form_id'])
+                try:
+                    with session.begin_nested():
+                        change_ids += _write_scrape_results(session, [form_update], [change] if change else [])
+                except SQLAlchemyError as e:
+                    logger.error("Failed to save monitoring results for form %s: %s", form_update['form_id'], e)
         session.commit()
-    logger.info("Agency and form data loaded successfully.")
+    except Exception as e:
+        session.rollback()
+        logger.error("Failed to save monitoring results for %s forms: %s", len(form_updates), e)
+    else:
+        if change_ids:
+            # Alerts read each change's form and agency; load them all in one joined query
+            changes = session.query(Change).options(joinedload(Change.form).joinedload(Form.agency)).\
+                filter(Change.id.in_(change_ids)).order_by(Change.id).all()
+            # Delivered in the background so the run moves on to the next batch; the
+            # notifier waits for outstanding alerts when it's closed at the end of the run.
+            notifier.send_alerts(changes)
+            for change in changes:
+                logger.info("Alert queued for change on %s.", change.form.name)
+    form_updates.clear()
+    new_changes.clear()
+
+def classify_severity(change_details):
+    """
+    Determines a change's severity from keywords in its details (simple example, could be
+    more complex). 'critical' wins over 'major'/'significant' wherever they appear.
+    """
+    keywords = set(keyword.lower() for keyword in SEVERITY_KEYWORD_PATTERN.findall(change_details))
+    if 'critical' in keywords:
+        return 'critical'
+    if keywords:
+        return 'high'
+    return 'medium'
+
+def _fetch_form(scraper, form_name, target_url):
+    """
+    Fetches a form's (new_content, new_hash_value). Runs on worker threads. Bodies are hashed
+    as they stream in, so only the hash is returned; new_content is only needed for pages
+    that require JS rendering.
+    """
+    if target_url.lower().endswith('.pdf'):
+        logger.info("Fetching PDF hash for %s from %s", form_name, target_url)
+        return None, scraper.get_pdf_hash(target_url)
+    logger.info("Fetching HTML content hash for %s from %s", form_name, target_url)
+    # For now, not using JS rendering (scraper.fetch_content) by default. Can be added as a form property.
+    return None, scraper.get_content_hash(target_url)
+
+def _fetch_bounded(executor, scraper, targets, max_in_flight):
+    """
+    Submits fetches for (form, target_url) pairs, keeping at most max_in_flight outstanding,
+    and yields (form, target_url, future) in submission order.
+    """
+    in_flight = deque()
+    for form, target_url in targets:
+        in_flight.append((form, target_url, executor.submit(_fetch_form, scraper, form.name, target_url)))
+        if len(in_flight) >= max_in_flight:
+            yield in_flight.popleft()
+    while in_flight:
+        yield in_flight.popleft()
+
+def _process_form(detector, form, target_url, new_content, new_hash_value):
+    """
+    Runs change detection on a fetched form.
+    Returns (form_update, change_row_or_None), or None if the fetch failed.
+    """
+    if not new_content and not new_hash_value:
+        logger.error("Failed to fetch %s from %s", form.name, target_url)
+        return None
+
+    is_changed, change_details, final_new_hash = detector.detect_change(
+        form.last_hash, 
+        new_content=new_content, 
+        new_hash_value=new_hash_value
+    )
+
+    change = None
+    if is_changed:
+        logger.warning("Change detected for %s! Details: %s", form.name, change_details)
+        change = {
+            'form_id': form.id,
+            'timestamp': datetime.utcnow(),
+            'change_details': change_details,
+            'severity': classify_severity(change_details)
+        }
+    else:
+        logger.info("No change detected for %s.", form.name)
+
+    form_update = {
+        'form_id': form.id,
+        'new_hash': final_new_hash,
+        'scraped_at': datetime.utcnow()
+    }
+    return form_update, change
+
+def monitor_all_forms(form_ids=None):
+    """Monitors all forms in the database for changes, or only those whose ids are in form_ids."""
+    from src.monitors.web_scraper import WebScraper
+    from src.monitors.change_detector import ChangeDetector
+    from src.notifications.notifier import Notifier
 
-def monitor_all_forms():
-    """Monitors all forms in the database for changes."""
     logger.info("Starting a full monitoring run...")
-    scraper = WebScraper(config_loader)
     detector = ChangeDetector()
-    notifier = Notifier(config_loader)
+    max_workers = app_config.get('monitoring_settings', {}).get('max_concurrent_requests', 16)
 
-    with db_session() as session:
-        forms = session.query(Form).all()
+    # A single scraper and notifier (and their pooled HTTP sessions) serve the whole run
+    with WebScraper(config_loader) as scraper, Notifier(config_loader) as notifier, db_session() as session:
+        # Only the columns the loop reads; full Form entities aren't needed since
+        # results are written back with a bulk UPDATE rather than through the ORM.
+        forms_query = session.query(
+            Form.id, Form.name, Form.url, Form.form_url, Form.last_hash,
+            Agency.name.label('agency_name')
+        ).outerjoin(Agency, Form.agency_id == Agency.id)
+        if form_ids is not None:
+            forms_query = forms_query.filter(Form.id.in_(form_ids))
+        forms = forms_query.all()
+
+        targets = []
         for form in forms:
-            logger.info(f"Monitoring form: {form.name} from {form.agency.name}")
-            
             target_url = form.form_url if form.form_url else form.url
             if not target_url:
-                logger.warning(f"Skipping form {form.name}: No URL configured.")
+                logger.warning("Skipping form %s: No URL configured.", form.name)
                 continue
+            targets.append((form, target_url))
+        # Group same-host forms so consecutive requests reuse the pooled keep-alive connection
+        targets.sort(key=lambda target: urlparse(target[1]).netloc)
+
+        # Fetches run on worker threads and overlap each other's network latency, while
+        # detection and database writes stay on this thread (the session isn't thread-safe)
+        # and consume results as they arrive.
+        form_updates = []
+        new_changes = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for form, target_url, fetch in _fetch_bounded(executor, scraper, targets, max_workers * 2):
+                logger.info("Monitoring form: %s from %s", form.name, form.agency_name)
+                try:
+                    result = _process_form(detector, form, target_url, *fetch.result())
+                except Exception as e:
+                    logger.error("Error monitoring %s at %s: %s", form.name, target_url, e)
+                    continue
+                if result is None:
+                    continue
+
+                form_update, change = result
+                form_updates.append(form_update)
+                if change is not None:
+                    new_changes.append(change)
+                if len(form_updates) >= COMMIT_BATCH_SIZE:
+                    _write_monitoring_batch(session, notifier, form_updates, new_changes)
 
-            new_content = None
-            new_hash_value = None
-
-            try:
-                if target_url.lower().endswith('.pdf'):
-                    logger.info(f"Fetching PDF hash for {form.name} from {target_url}")
-                    new_hash_value = scraper.get_pdf_hash(target_url)
-                    if not new_hash_value:
-                        logger.error(f"Failed to get PDF hash for {form.name} from {target_url}")
-                        continue
-                else:
-                    logger.info(f"Fetching HTML content for {form.name} from {target_url}")
-                    # For now, not using JS rendering by default. Can be added as a form property.
-                    new_content = scraper.fetch_content(target_url, use_js_rendering=False) 
-                    if not new_content:
-                        logger.error(f"Failed to fetch HTML content for {form.name} from {target_url}")
-                        continue
-                
-                is_changed, change_details, final_new_hash = detector.detect_change(
-                    form.last_hash, 
-                    new_content=new_content, 
-                    new_hash_value=new_hash_value
-                )
-                
-                if is_changed:
-                    logger.warning(f"Change detected for {form.name}! Details: {change_details}")
-                    # Determine severity (simple example, could be more complex based on change_details)
-                    severity = "medium" 
-                    if "critical" in change_details.lower():
-                        severity = "critical"
-                    elif "major" in change_details.lower() or "significant" in change_details.lower():
-                        severity = "high"
-                    
-                    change = Change(
-                        form_id=form.id,
-                        timestamp=datetime.utcnow(),
-                        change_details=change_details,
-                        severity=severity
-                    )
-                    session.add(change)
-                    session.commit() # Commit immediately to get change ID for notification
-                    
-                    notifier.send_alert(change)
-                    logger.info(f"Alert sent for change on {form.name}.")
-                else:
-                    logger.info(f"No change detected for {form.name}.")
-                
-                form.last_hash = final_new_hash
-                form.last_scraped_at = datetime.utcnow()
-                session.add(form)
-                session.commit()
-
-            except Exception as e:
-                logger.error(f"Error monitoring {form.name} at {target_url}: {e}")
+        _write_monitoring_batch(session, notifier, form_updates, new_changes)
     logger.info("Full monitoring run completed.")
 
-def run_dashboard():
-    """Runs the Flask web dashboard."""
+def run_dashboard(enable_run_immediate=True):
+    """
+    Runs the Flask web dashboard. enable_run_immediate registers monitor_all_forms for
+    /api/scheduler/run-immediate; leave it off when a scheduler process is also running,
+    since the one-run-at-a-time guard and alert dedupe only hold within a process.
+    """
+    from src.api.main import app as flask_app, set_monitor_function
+
     logger.info("Starting Flask web dashboard...")
-    flask_app.run(debug=True, host='0.0.0.0', port=8000)
+    if enable_run_immediate:
+        set_monitor_function(monitor_all_forms)
+    # Flask's development server, for local use; production serves src.api.wsgi with Gunicorn.
+    # The debugger and reloader are opt-in (FLASK_DEBUG=1) since the reloader runs the app twice.
+    debug = os.getenv('FLASK_DEBUG', '').lower() in ('1', 'true')
+    flask_app.run(debug=debug, host='0.0.0.0', port=int(os.getenv('PORT', 8000)), threaded=True)
 
 def run_scheduler_only():
     """Runs only the monitoring scheduler."""
+    from src.scheduler.monitoring_scheduler import MonitoringScheduler
+
     logger.info("Starting monitoring scheduler...")
     scheduler = MonitoringScheduler(config_loader, monitor_all_forms)
     # set_scheduler_instance(scheduler) # Pass the scheduler instance to the Flask app
     scheduler.add_monitoring_jobs() # Add jobs based on config/DB
     scheduler.start()
     
-    # Keep the main thread alive for the scheduler
+    # Keep the thread alive for the scheduler, sleeping until interrupted or sent SIGTERM
+    stop_event = threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
     try:
-        while True:
-            import time
-            time.sleep(1)
+        stop_event.wait()
     except (KeyboardInterrupt, SystemExit):
-        scheduler.stop()
-        logger.info("Scheduler stopped.")
+        pass
+    scheduler.stop()
+    logger.info("Scheduler stopped.")
 
 def run_tests():
     """Runs system tests."""
@@ -203,8 +332,9 @@ def run_tests():
             logger.error("Config loading test: FAILED (config is empty)")
 
         # Test notifier (sends dummy email/slack/teams)
-        notifier = Notifier(config_loader)
-        notifier.test_notifications()
+        from src.notifications.notifier import Notifier
+        with Notifier(config_loader) as notifier:
+            notifier.test_notifications()
         logger.info("Notifier test: Check your configured notification channels for test messages.")
 
         logger.info("All basic tests completed. Review logs for details.")
@@ -231,13 +361,18 @@ if __name__ == "__main__":
     elif args.command == 'monitor':
         monitor_all_forms()
     elif args.command == 'start':
-        # Start scheduler in a separate thread
-        scheduler_thread = threading.Thread(target=run_scheduler_only)
-        scheduler_thread.daemon = True # Allow main program to exit even if thread is running
-        scheduler_thread.start()
+        # Run the scheduler in its own process so monitoring work doesn't compete
+        # with dashboard requests for the GIL; the two share state through the database.
+        scheduler_process = multiprocessing.Process(target=run_scheduler_only, daemon=True)
+        scheduler_process.start()
         
-        # Run dashboard in the main thread (Flask's run() is blocking)
-        run_dashboard()
+        # Run dashboard in the main process (Flask's run() is blocking). Runs belong to the
+        # scheduler process, so the dashboard doesn't start its own overlapping ones.
+        try:
+            run_dashboard(enable_run_immediate=False)
+        finally:
+            scheduler_process.terminate()
+            scheduler_process.join()
     elif args.command == 'dashboard':
         run_dashboard()
     elif args.command == 'scheduler':
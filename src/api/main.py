@@ -1,103 +1,336 @@
-from flask import Flask, render_template, jsonify, request, abort
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, desc, func
-from sqlalchemy.orm import joinedload
-from src.database.models import Base, Agency, Form, Change
-from src.database.connection import db_session
+from flask import Flask, Response, render_template, request, abort, stream_with_context
+from flask_compress import Compress
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import and_, desc, func, or_, select
+from sqlalchemy.orm import joinedload, selectinload
+from src.database.models import Agency, Form, Change
+from src.database.connection import db_session, remove_session
+from src.utils.cache import TTLCache
 import os
+import re
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import orjson
+from functools import lru_cache, wraps
 
 app = Flask(__name__, template_folder='../../templates', static_folder='../../static')
+# Keep compiled templates on disk so new workers skip parsing them. Template auto-reload
+# (a stat per render) stays tied to debug mode, which Flask already disables in production.
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+# Compress JSON responses over 1 KB (Brotli where the client accepts it, otherwise gzip).
+# Brotli level 4 keeps compression cheap enough to run per request. Streamed responses
+# such as /api/changes are left uncompressed: Flask-Compress would buffer the whole
+# generator in memory to compress it.
+app.config.update(
+    COMPRESS_MIMETYPES=['application/json'],
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_BR_LEVEL=4,
+    COMPRESS_MIN_SIZE=1024,
+    COMPRESS_STREAMS=False,
+)
+Compress(app)
+
+@app.teardown_appcontext
+def _remove_db_session(exception=None):
+    # Sessions are scoped per thread (per greenlet under gevent); drop this request's
+    # so the registry doesn't keep one around for every worker thread that served a request.
+    remove_session()
+
+# Dashboard pages poll /api/stats; counts may be up to this many seconds stale
+STATS_CACHE_TTL = 30
+# Upper bound on cached API results (stats plus one entry per agency's form list)
+API_CACHE_MAX_ENTRIES = 256
+api_cache = TTLCache(default_ttl=STATS_CACHE_TTL, maxsize=API_CACHE_MAX_ENTRIES)
+
+# Form lists only change when a monitoring run records new hashes and scrape times
+FORMS_CACHE_TTL = 60
+
+# Changes shown per page of a form's history
+CHANGES_PAGE_SIZE = 100
+
+# Clients and proxies may reuse /api GET responses for this long before revalidating
+API_CACHE_MAX_AGE = 15
+
+# Rows fetched and serialized per chunk when streaming /api/changes
+CHANGES_STREAM_BATCH_SIZE = 500
+
+def json_response(data, status=200):
+    """Builds a JSON response using orjson, which is considerably faster than flask.jsonify."""
+    return Response(orjson.dumps(data), status=status, mimetype='application/json')
+
+# Flask-Compress appends ":<algorithm>" to the ETag of a compressed response, and clients
+# send that tag back in If-None-Match
+COMPRESSED_ETAG_SUFFIX = re.compile(r':(?:br|gzip|deflate)$')
+
+def _etag_matches(etag):
+    """True when If-None-Match names etag, ignoring weakness and any compression suffix."""
+    if_none_match = request.if_none_match
+    if if_none_match.star_tag:
+        return True
+    return any(COMPRESSED_ETAG_SUFFIX.sub('', tag) == etag for tag in if_none_match.as_set(include_weak=True))
+
+def _set_cache_headers(response, etag):
+    response.set_etag(etag, weak=True)
+    response.cache_control.public = True
+    response.cache_control.max_age = API_CACHE_MAX_AGE
+    return response
+
+def conditional_get(version=None):
+    """
+    Decorator adding a weak ETag and Cache-Control to a GET endpoint, answering a matching
+    If-None-Match with 304 Not Modified. When version() is given the ETag is derived from
+    its value, so a match skips the handler entirely; otherwise it hashes the response body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if version is not None:
+                etag = hashlib.sha1(repr(version()).encode('utf-8')).hexdigest()
+                if _etag_matches(etag):
+                    return _set_cache_headers(Response(status=304), etag)
+                response = view(*args, **kwargs)
+            else:
+                response = view(*args, **kwargs)
+                response.add_etag(weak=True)
+                etag = response.get_etag()[0]
+                if _etag_matches(etag):
+                    return _set_cache_headers(Response(status=304), etag)
+            return _set_cache_headers(response, etag)
+        return wrapper
+    return decorator
+
+# Columns emitted by Agency.to_dict() / Form.to_dict() / Change.to_dict(), selected directly by list endpoints so
+# rows come back as plain mappings instead of hydrated ORM objects. orjson renders the
+# datetime columns in the same ISO format to_dict() produces.
+AGENCY_FIELDS = (
+    Agency.id, Agency.name, Agency.abbreviation, Agency.base_url,
+    Agency.prevailing_wage_url, Agency.phone, Agency.email
+)
+FORM_FIELDS = (
+    Form.id, Form.agency_id, Form.name, Form.title, Form.url, Form.form_url, Form.instructions_url,
+    Form.check_frequency, Form.contact_email, Form.last_hash, Form.last_scraped_at
+)
+CHANGE_FIELDS = (
+    Change.id, Change.form_id, Change.timestamp, Change.change_details, Change.severity, Change.is_reviewed
+)
 
 # API Routes
-@app.route('/api/stats')
-def get_stats():
+def _compute_stats():
     with db_session() as session:
-        total_agencies = session.query(Agency).count()
-        total_forms = session.query(Form).count()
-        recent_changes = session.query(Change).options(joinedload(Change.form)).order_by(desc(Change.timestamp)).limit(10).all()
-    return jsonify({
+        # All three counts as scalar subqueries of one SELECT: a single round trip.
+        # Recent changes (at most 10, as shown on the dashboard) are counted over a
+        # LIMIT subquery so the whole changes table is never scanned or loaded.
+        recent_changes = session.query(Change.id).limit(10).subquery()
+        total_agencies, total_forms, recent_changes_count = session.query(
+            session.query(func.count(Agency.id)).scalar_subquery(),
+            session.query(func.count(Form.id)).scalar_subquery(),
+            session.query(func.count()).select_from(recent_changes).scalar_subquery()
+        ).one()
+    return {
         'total_agencies': total_agencies,
         'total_forms': total_forms,
-        'recent_changes_count': len(recent_changes)
-    })
+        'recent_changes_count': recent_changes_count
+    }
+
+@app.route('/api/stats')
+@conditional_get()
+def get_stats():
+    return json_response(api_cache.get_or_set('stats', _compute_stats))
+
+# Version queries run on every request to their endpoints, so they're built once at import
+AGENCIES_VERSION_QUERY = select(func.count(Agency.id), func.max(Agency.id))
+CHANGES_VERSION_QUERY = select(func.count(Change.id), func.max(Change.id), func.max(Change.timestamp))
+
+def _agencies_version():
+    """Agencies are only ever inserted, so (count, max id) identifies the table's contents."""
+    with db_session() as session:
+        return tuple(session.execute(AGENCIES_VERSION_QUERY).one())
+
+@lru_cache(maxsize=4)
+def _agencies_json(version):
+    """Serialized agency list for a given _agencies_version(); the argument is the cache key."""
+    with db_session() as session:
+        agencies_data = [dict(row) for row in session.execute(select(*AGENCY_FIELDS)).mappings()]
+    return orjson.dumps(agencies_data)
 
 @app.route('/api/agencies')
+@conditional_get()
 def get_agencies():
+    return Response(_agencies_json(_agencies_version()), mimetype='application/json')
+
+def _agency_forms_json(agency_id):
+    """Serialized forms of one agency; cached already encoded so a hit skips serialization too."""
     with db_session() as session:
-        agencies = session.query(Agency).all()
-    return jsonify([agency.to_dict() for agency in agencies])
+        forms_data = [
+            dict(row) for row in session.execute(select(*FORM_FIELDS).where(Form.agency_id == agency_id)).mappings()
+        ]
+    return orjson.dumps(forms_data)
 
 @app.route('/api/agency/<int:agency_id>/forms')
+@conditional_get()
 def get_agency_forms(agency_id):
+    # Empty lists (including every unknown agency id) aren't cached, so requests for
+    # arbitrary ids can't fill the cache
+    return Response(api_cache.get_or_set(f'agency_forms:{agency_id}', lambda: _agency_forms_json(agency_id),
+                                         ttl=FORMS_CACHE_TTL, cache_if=lambda forms_json: forms_json != b'[]'),
+                    mimetype='application/json')
+
+def _stream_changes(before=None, before_id=None, limit=None):
+    """
+    Yields changes newest first as a JSON array, one fetched batch at a time. Only changes
+    older than the (before, before_id) cursor are included, and at most limit of them,
+    when those are given.
+    """
+    query = select(*CHANGE_FIELDS).order_by(desc(Change.timestamp), desc(Change.id))
+    # Keyset pagination: clients pass the timestamp and id of the last change they saw, so
+    # later pages are an index range scan on ix_change_ts rather than an OFFSET that re-reads
+    # skipped rows. The id breaks ties between changes written with the same timestamp.
+    if before is not None:
+        if before_id is None:
+            query = query.where(Change.timestamp < before)
+        else:
+            query = query.where(or_(
+                Change.timestamp < before,
+                and_(Change.timestamp == before, Change.id < before_id)
+            ))
+    if limit is not None:
+        query = query.limit(limit)
+    with db_session() as session:
+        # yield_per uses a server-side cursor where supported, so rows aren't all buffered
+        result = session.execute(query.execution_options(yield_per=CHANGES_STREAM_BATCH_SIZE))
+        yield b'['
+        first = True
+        for batch in result.mappings().partitions():
+            chunk = b','.join(orjson.dumps(dict(row)) for row in batch)
+            yield chunk if first else b',' + chunk
+            first = False
+        yield b']'
+
+def _changes_version():
+    """Cheap summary of the changes table that moves whenever a change is added or removed."""
     with db_session() as session:
-        forms = session.query(Form).filter_by(agency_id=agency_id).all()
-    return jsonify([form.to_dict() for form in forms])
+        return tuple(session.execute(CHANGES_VERSION_QUERY).one())
+
+def _optional_int_arg(name):
+    """Returns query argument name as an int, None if absent; raises ValueError if it isn't one."""
+    value = request.args.get(name)
+    return None if value is None else int(value)
 
 @app.route('/api/changes')
+@conditional_get(version=_changes_version)
 def get_changes():
-    with db_session() as session:
-        changes = session.query(Change).options(joinedload(Change.form)).order_by(desc(Change.timestamp)).all()
-    return jsonify([change.to_dict() for change in changes])
+    # Optional ?before=<ISO timestamp>&before_id=<id>&limit=<n> page through the history,
+    # before/before_id being the last change of the previous page; without them every change
+    # is returned. Either way the response is streamed, not built in memory.
+    try:
+        limit = _optional_int_arg('limit')
+        before_id = _optional_int_arg('before_id')
+        before = request.args.get('before')
+        if before is not None:
+            before = datetime.fromisoformat(before)
+    except ValueError:
+        abort(400)
+    if limit is not None and limit < 1:
+        abort(400)
+    return Response(stream_with_context(_stream_changes(before, before_id, limit)), mimetype='application/json')
+
+# Monitoring runs requested through the API execute on a single background worker,
+# so repeated requests can't pile up threads or database connections.
+_monitor_function = None
+_monitor_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='run-immediate')
+_monitor_future = None
+_monitor_lock = threading.Lock()
+
+# Bearer token callers must send to trigger monitoring runs. Requiring a header also keeps
+# cross-site form posts (CSRF) out; without a configured token the endpoint stays closed.
+MONITOR_API_TOKEN = os.getenv('MONITOR_API_TOKEN')
+
+def _has_monitor_token():
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(MONITOR_API_TOKEN) and scheme.lower() == 'bearer' and \
+        hmac.compare_digest(token.encode('utf-8'), MONITOR_API_TOKEN.encode('utf-8'))
+
+def set_monitor_function(monitor_function):
+    """Registers the function run by /api/scheduler/run-immediate (main.monitor_all_forms)."""
+    global _monitor_function
+    _monitor_function = monitor_function
+
+@app.route('/api/scheduler/run-immediate', methods=['POST'])
+def run_immediate_monitor():
+    global _monitor_future
+    if not _has_monitor_token():
+        return json_response({'error': 'A valid MONITOR_API_TOKEN bearer token is required.'}, status=401)
+    if _monitor_function is None:
+        return json_response({'error': 'Monitoring is not available in this process.'}, status=503)
+    with _monitor_lock:
+        if _monitor_future is not None and not _monitor_future.done():
+            return json_response({'message': 'A monitoring run is already in progress.'}, status=409)
+        _monitor_future = _monitor_executor.submit(_monitor_function)
+    return json_response({'message': 'Monitoring run started.'}, status=202)
 
 # Web Dashboard Routes
+# Rank each agency's changes newest first in a single pass; rank 1 is the latest.
+# Ties on timestamp are broken by id so every agency yields exactly one change.
+_ranked_changes = select(
+    Change.id.label('change_id'),
+    func.row_number().over(
+        partition_by=Form.agency_id,
+        order_by=(desc(Change.timestamp), desc(Change.id))
+    ).label('rank')
+).join(Form, Change.form_id == Form.id).where(Form.agency_id.isnot(None)).subquery()
+
+# Latest change per agency, selecting only the columns index.html renders. Built once at import
+# since it takes no parameters; each request then only looks up its cached compiled SQL.
+LATEST_CHANGE_PER_AGENCY_QUERY = select(
+    Change.timestamp, Change.severity, Change.change_details,
+    Form.id.label('form_id'), Form.name.label('form_name'),
+    Agency.id.label('agency_id'), Agency.name.label('agency_name')
+).\
+    join(_ranked_changes, Change.id == _ranked_changes.c.change_id).\
+    join(Form, Change.form_id == Form.id).\
+    join(Agency, Form.agency_id == Agency.id).\
+    where(_ranked_changes.c.rank == 1).\
+    order_by(desc(Change.timestamp))
+
 @app.route('/')
 def index():
+    # Totals come from the same short-lived cache as /api/stats instead of two COUNT queries
+    stats = api_cache.get_or_set('stats', _compute_stats)
     with db_session() as session:
-        total_agencies = session.query(Agency).count()
-        total_forms = session.query(Form).count()
-        
-        # Subquery to get the latest change_id for each *agency*
-        latest_change_per_agency_subquery = session.query(
-            Agency.id.label('agency_id'),
-            func.max(Change.timestamp).label('max_timestamp')
-        ).join(Form, Agency.id == Form.agency_id).join(Change, Form.id == Change.form_id).group_by(Agency.id).subquery()
-
-        # Query to get the Change objects corresponding to the latest timestamps per agency, eagerly loading form and agency
-        recent_changes_query = session.query(Change).\
-            join(Form, Change.form_id == Form.id).\
-            join(Agency, Form.agency_id == Agency.id).\
-            join(latest_change_per_agency_subquery,
-                 (Agency.id == latest_change_per_agency_subquery.c.agency_id) & 
-                 (Change.timestamp == latest_change_per_agency_subquery.c.max_timestamp)).\
-            options(joinedload(Change.form).joinedload(Form.agency)).\
-            order_by(desc(Change.timestamp)).\
-            all()
-
-        recent_changes = []
-        for change in recent_changes_query:
-            change_dict = change.to_dict()
-            if change.form:
-                form_dict = change.form.to_dict()
-                if form_dict['last_scraped_at']:
-                    form_dict['last_scraped_at'] = datetime.fromisoformat(form_dict['last_scraped_at']).strftime('%Y-%m-%d %H:%M:%S')
-                if change.form.agency:
-                    form_dict['agency'] = change.form.agency.to_dict()
-                change_dict['form'] = form_dict
-            recent_changes.append(change_dict)
+        recent_changes = session.execute(LATEST_CHANGE_PER_AGENCY_QUERY).all()
 
     return render_template('index.html', 
-                           total_agencies=total_agencies, 
-                           total_forms=total_forms, 
+                           total_agencies=stats['total_agencies'], 
+                           total_forms=stats['total_forms'], 
                            recent_changes=recent_changes)
 
-@app.route('/agencies')
-def agencies_page():
+@lru_cache(maxsize=4)
+def _agencies_page_html(version):
+    """Rendered agencies page for a given _agencies_version(); nothing on it varies per request."""
     with db_session() as session:
-        agencies = session.query(Agency).all()
-        agencies_data = [agency.to_dict(include_forms=False) for agency in agencies] # include_forms=False to prevent too much data on overview
+        # Overview only; forms aren't included to prevent too much data
+        agencies_data = [dict(row) for row in session.execute(select(*AGENCY_FIELDS)).mappings()]
     return render_template('agencies.html', agencies=agencies_data)
 
+@app.route('/agencies')
+def agencies_page():
+    return _agencies_page_html(_agencies_version())
+
 @app.route('/agency/<int:agency_id>')
 def agency_detail_page(agency_id):
     with db_session() as session:
-        agency = session.query(Agency).filter_by(id=agency_id).first()
+        # Forms are a collection, so they're loaded with one extra IN query (selectinload)
+        # rather than a JOIN that repeats the agency's columns on every form row.
+        # agency_detail.html only shows the forms' own fields, so their changes aren't loaded.
+        agency = session.query(Agency).options(selectinload(Agency.forms)).filter_by(id=agency_id).first()
         if not agency:
             abort(404)
-        # Eagerly load forms for the agency
-        forms = session.query(Form).filter_by(agency_id=agency_id).options(joinedload(Form.changes)).all()
         agency_data = agency.to_dict() # Don't include forms here, pass separately
-        forms_data = [form.to_dict(include_changes=True) for form in forms]
+        forms_data = [form.to_dict() for form in agency.forms]
     return render_template('agency_detail.html', agency=agency_data, forms=forms_data)
 
 @app.route('/form/<int:form_id>')
@@ -106,10 +339,17 @@ def form_detail_page(form_id):
         form = session.query(Form).filter_by(id=form_id).options(joinedload(Form.agency)).first()
         if not form:
             abort(404)
-        changes = session.query(Change).filter_by(form_id=form_id).order_by(desc(Change.timestamp)).all()
+        # One page of history, newest first; one extra row tells us whether an older page exists.
+        # The id tiebreak keeps the order stable, so same-timestamp changes don't shift between pages.
+        page = max(request.args.get('page', 1, type=int), 1)
+        changes = session.query(Change).filter_by(form_id=form_id).order_by(desc(Change.timestamp), desc(Change.id)).\
+            offset((page - 1) * CHANGES_PAGE_SIZE).limit(CHANGES_PAGE_SIZE + 1).all()
+        has_next_page = len(changes) > CHANGES_PAGE_SIZE
         form_data = form.to_dict(include_agency=True) # Eagerly load agency
-        changes_data = [change.to_dict(include_form=True) for change in changes] # Include form data for each change
-    return render_template('form_detail.html', form=form_data, changes=changes_data)
+        # The template only shows each change's own fields, so the form isn't repeated per change
+        changes_data = [change.to_dict() for change in changes[:CHANGES_PAGE_SIZE]]
+    return render_template('form_detail.html', form=form_data, changes=changes_data,
+                           page=page, has_next_page=has_next_page)
 
 if __name__ == '__main__':
     from src.database.connection import init_db
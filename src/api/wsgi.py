@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers:
+    gunicorn -c gunicorn.conf.py src.api.wsgi:application
+
+No monitor function is registered here, so /api/scheduler/run-immediate answers 503:
+its one-run-at-a-time guard is per process, and each Gunicorn worker would otherwise
+start its own run alongside the separate scheduler process.
+"""
+from src.api.main import app
+
+application = app
@@ -1,11 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, delete, event, inspect, select, update
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.exc import SQLAlchemyError
 import logging
+import os
 from contextlib import contextmanager
 
 # Assuming models are in src.database.models
-from src.database.models import Base
+from src.database.models import Base, Form, Change
 from src.utils.config_loader import ConfigLoader
 
 logger = logging.getLogger(__name__)
@@ -14,16 +16,98 @@ logger = logging.getLogger(__name__)
 config_loader = ConfigLoader()
 DATABASE_URL = config_loader.get_setting('DATABASE_URL', 'sqlite:///./data/payroll_monitor.db')
 DB_ECHO = config_loader.get_setting('DB_ECHO', False) # For SQLAlchemy logging
+# Pool sizing is per process: each Gunicorn worker and the scheduler get their own pool, so
+# the database can see up to (processes x (DB_POOL_SIZE + DB_MAX_OVERFLOW)) connections
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 5))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800)) # Seconds before a connection is replaced
 
 engine = None
 Session = None
 
+def _engine_options():
+    """Keyword arguments for create_engine: a larger compiled-statement cache and pool tuning."""
+    options = {
+        'echo': DB_ECHO,
+        'query_cache_size': 1200,
+        'pool_pre_ping': True, # Transparently replace connections dropped by the server
+    }
+    url = make_url(DATABASE_URL)
+    # In-memory SQLite uses a single-connection pool that doesn't accept sizing arguments
+    if not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_recycle=DB_POOL_RECYCLE)
+    return options
+
+# Applied to every new SQLite connection. WAL lets the dashboard keep reading while the
+# scheduler writes; synchronous=NORMAL is still crash-safe under WAL. mmap and a 64 MB page
+# cache let reads come straight from memory instead of read() syscalls.
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-64000",
+)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in SQLITE_PRAGMAS:
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+def _merge_duplicate_forms(engine):
+    """
+    Merges forms sharing an (agency_id, name) into the oldest one, moving their changes to it,
+    so the unique ix_form_agency_name index can be created on databases that predate it.
+    """
+    forms, changes = Form.__table__, Change.__table__
+    with engine.begin() as connection:
+        if 'ix_form_agency_name' in {index['name'] for index in inspect(connection).get_indexes(forms.name)}:
+            return
+        kept_ids = {}
+        merges = []
+        rows = connection.execute(
+            select(forms.c.id, forms.c.agency_id, forms.c.name)
+            .where(forms.c.agency_id.isnot(None)).order_by(forms.c.id)
+        )
+        for form_id, agency_id, name in rows:
+            kept_id = kept_ids.setdefault((agency_id, name), form_id)
+            if kept_id != form_id:
+                merges.append({'duplicate_id': form_id, 'kept_id': kept_id})
+        if not merges:
+            return
+        connection.execute(
+            update(changes).where(changes.c.form_id == bindparam('duplicate_id')).values(form_id=bindparam('kept_id')),
+            merges
+        )
+        connection.execute(delete(forms).where(forms.c.id.in_([merge['duplicate_id'] for merge in merges])))
+        logger.warning(f"Merged {len(merges)} duplicate forms before creating ix_form_agency_name")
+
+def _create_missing_indexes(engine):
+    """
+    Creates model indexes missing from existing tables. create_all() only creates indexes
+    along with their table, so databases created before an index was added never get it.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                with engine.begin() as connection:
+                    index.create(bind=connection, checkfirst=True)
+            except SQLAlchemyError as e:
+                logger.error(f"Could not create index {index.name} on {table.name}: {e}")
+
 def init_db():
     """Initializes the database engine and creates tables if they don't exist."""
     global engine, Session
     try:
-        engine = create_engine(DATABASE_URL, echo=DB_ECHO)
+        engine = create_engine(DATABASE_URL, **_engine_options())
+        if engine.url.get_backend_name() == 'sqlite':
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
         Base.metadata.create_all(engine)
+        _merge_duplicate_forms(engine)
+        _create_missing_indexes(engine)
         Session = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
         logger.info(f"Database initialized successfully at {DATABASE_URL}")
     except SQLAlchemyError as e:
@@ -52,4 +136,9 @@ def db_session():
         logger.error(f"An unexpected error occurred during database operation: {e}")
         raise
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
+
+def remove_session():
+    """Discards the current thread's scoped session; called when a web request ends."""
+    if Session is not None:
+        Session.remove()
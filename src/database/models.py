@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -32,6 +32,10 @@ class Agency(Base):
 
 class Form(Base):
     __tablename__ = 'forms'
+    __table_args__ = (
+        # Forms are looked up by (agency_id, name) when loading config; a name is unique per agency
+        Index('ix_form_agency_name', 'agency_id', 'name', unique=True),
+    )
     id = Column(Integer, primary_key=True)
     agency_id = Column(Integer, ForeignKey('agencies.id'))
     name = Column(String, nullable=False)
@@ -75,6 +79,11 @@ class Change(Base):
     severity = Column(String) # e.g., 'low', 'medium', 'high', 'critical'
     is_reviewed = Column(Boolean, default=False)
     form = relationship("Form", back_populates="changes")
+    __table_args__ = (
+        # Serve "newest first" listings, per form and overall, straight from the index
+        Index('ix_change_form_ts', form_id, timestamp.desc()),
+        Index('ix_change_ts', timestamp.desc()),
+    )
 
     def to_dict(self, include_form=False):
         data = {
@@ -8,7 +8,10 @@ class ChangeDetector:
         logger.info("ChangeDetector initialized.")
 
     def _calculate_hash(self, content):
-        """Calculates the SHA256 hash of the given content."""
+        """
+        Calculates the SHA256 hash of the given text, encoded as UTF-8. Stored hashes use this
+        scheme, so content must be the decoded text rather than the raw response bytes.
+        """
         if not content:
             return None
         return hashlib.sha256(content.encode('utf-8')).hexdigest()
@@ -29,10 +32,10 @@ class ChangeDetector:
 
         if new_hash_value:
             final_new_hash = new_hash_value
-            logger.debug(f"Using provided new hash: {final_new_hash[:10]}...")
+            logger.debug("Using provided new hash: %s...", final_new_hash[:10])
         elif new_content is not None:
             final_new_hash = self._calculate_hash(new_content)
-            logger.debug(f"Calculated new hash from content: {final_new_hash[:10]}...")
+            logger.debug("Calculated new hash from content: %s...", final_new_hash[:10])
         else:
             logger.warning("No new content or new hash value provided for change detection.")
             return False, "No new content to compare.", old_hash # No change, keep old hash
@@ -46,7 +49,7 @@ class ChangeDetector:
             return True, "Initial content scraped.", final_new_hash
         
         if old_hash != final_new_hash:
-            logger.info(f"Change detected! Old hash: {old_hash[:10]}..., New hash: {final_new_hash[:10]}...")
+            logger.info("Change detected! Old hash: %s..., New hash: %s...", old_hash[:10], final_new_hash[:10])
             return True, "Content hash changed.", final_new_hash
         else:
             logger.info("No change detected. Hashes match.")
@@ -1,22 +1,99 @@
 import requests
 import logging
+import codecs
 import hashlib
+import queue
+import threading
+import time
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup # Although not directly used for content fetching, good for future parsing
 
 logger = logging.getLogger(__name__)
 
+# Streamed bodies are hashed in 1 MiB pieces so hashlib works on large buffers
+# rather than being called (and re-entered from Python) thousands of times per file
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Responses worth retrying: rate limiting and server-side errors. Other 4xx (404, 403, ...)
+# won't change on a retry, so they fail immediately instead of holding a fetch worker.
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+class _ValidatorCache:
+    """
+    Thread-safe LRU of (kind, url) -> (etag, last_modified, result) for conditional requests.
+    The kind names what result holds (the body or its digest), so paths that extract different
+    results from the same URL never get each other's value back on a 304.
+    Module-level so scheduled runs in the same process can revalidate instead of re-downloading.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, etag, last_modified, result):
+        with self._lock:
+            self._entries[key] = (etag, last_modified, result)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+_validator_cache = _ValidatorCache(maxsize=512)
+
 class WebScraper:
     def __init__(self, config_loader):
         self.config_loader = config_loader
         self.monitoring_settings = self.config_loader.get_setting('monitoring_settings')
         self.user_agent = self.monitoring_settings.get('user_agent', 'PayrollMonitor/1.0 (Government Forms Monitoring)')
         self.timeout = self.monitoring_settings.get('timeout_seconds', 30)
+        self.retry_attempts = max(1, self.monitoring_settings.get('retry_attempts', 3))
+        # One pooled session per scraper so repeat requests to a host reuse the TCP/TLS connection
+        pool_size = self.monitoring_settings.get('max_concurrent_requests', 16)
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': self.user_agent})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Headless Chrome instances are reused across JS-rendered fetches; starting one takes seconds.
+        # At most one is created per concurrent fetch, and idle ones wait here until close().
+        self._idle_drivers = queue.LifoQueue()
+        self._driver_path = None
+        self._driver_path_lock = threading.Lock()
         logger.info("WebScraper initialized.")
 
+    def close(self):
+        """Closes the underlying HTTP session and its pooled connections, and quits idle Chrome drivers."""
+        self.session.close()
+        while True:
+            try:
+                driver = self._idle_drivers.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception as e:
+                logger.warning("Failed to quit Chrome driver: %s", e)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def _get_chrome_driver(self):
         """Initializes and returns a headless Chrome WebDriver."""
         chrome_options = Options()
@@ -26,23 +103,98 @@ class WebScraper:
         chrome_options.add_argument(f"user-agent={self.user_agent}")
         
         try:
-            service = Service(ChromeDriverManager().install())
+            # Resolve (and if needed download) the chromedriver binary once per scraper
+            with self._driver_path_lock:
+                if self._driver_path is None:
+                    self._driver_path = ChromeDriverManager().install()
+            service = Service(self._driver_path)
             driver = webdriver.Chrome(service=service, options=chrome_options)
             return driver
         except Exception as e:
-            logger.error(f"Failed to initialize Chrome driver: {e}")
+            logger.error("Failed to initialize Chrome driver: %s", e)
             return None
 
+    def _acquire_driver(self):
+        """Returns an idle pooled Chrome driver, starting a new one if none is free."""
+        try:
+            return self._idle_drivers.get_nowait()
+        except queue.Empty:
+            return self._get_chrome_driver()
+
+    def _release_driver(self, driver):
+        """Resets a driver to a blank page and returns it to the pool, or quits it if that fails."""
+        try:
+            driver.get("about:blank")
+        except Exception:
+            driver.quit()
+            return
+        self._idle_drivers.put(driver)
+
+    def _get(self, url, **kwargs):
+        """
+        Performs a GET request, retrying connection errors, timeouts and retryable status codes
+        with exponential backoff. Raises the RequestException at once for any other failure,
+        or the last one if every attempt fails.
+        """
+        for attempt in range(self.retry_attempts):
+            try:
+                response = self.session.get(url, timeout=self.timeout, **kwargs)
+                response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+                return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.HTTPError) as e:
+                if e.response is not None:
+                    e.response.close() # Return a streamed response's connection to the pool
+                if isinstance(e, requests.exceptions.HTTPError) and e.response.status_code not in RETRYABLE_STATUS_CODES:
+                    raise
+                if attempt == self.retry_attempts - 1:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("Request to %s failed (%s); retrying in %ss", url, e, delay)
+                time.sleep(delay)
+
+    def _get_revalidated(self, url, kind, extract, **kwargs):
+        """
+        GETs a URL with If-None-Match/If-Modified-Since taken from the last response seen for it.
+        On 304 Not Modified the cached result is returned without downloading the body;
+        otherwise extract(response) is computed and cached with the new validators.
+        kind identifies what extract returns ('text', 'text_sha256' or 'sha256') and is part of the cache key.
+        """
+        cache_key = (kind, url)
+        entry = _validator_cache.get(cache_key)
+        headers = {}
+        if entry is not None:
+            etag, last_modified, _ = entry
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = self._get(url, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            logger.info("%s not modified since last fetch; reusing cached result.", url)
+            response.close()
+            return entry[2]
+
+        result = extract(response)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            _validator_cache.put(cache_key, etag, last_modified, result)
+        elif entry is not None:
+            # The resource no longer sends validators; don't keep revalidating with stale ones
+            _validator_cache.discard(cache_key)
+        return result
+
     def fetch_content(self, url, use_js_rendering=False):
         """
         Fetches content from a given URL.
         If use_js_rendering is True, uses Selenium for JavaScript-heavy pages.
         Otherwise, uses requests for static content.
         """
-        logger.info(f"Fetching content from: {url} (JS rendering: {use_js_rendering})")
+        logger.info("Fetching content from: %s (JS rendering: %s)", url, use_js_rendering)
         try:
             if use_js_rendering:
-                driver = self._get_chrome_driver()
+                driver = self._acquire_driver()
                 if not driver:
                     return None
                 try:
@@ -52,41 +204,78 @@ class WebScraper:
                     # from selenium.webdriver.support import expected_conditions as EC
                     # from selenium.webdriver.common.by import By
                     # WebDriverWait(driver, self.timeout).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                    return driver.page_source
-                finally:
-                    driver.quit()
+                    page_source = driver.page_source
+                except Exception:
+                    driver.quit() # Don't return a driver in an unknown state to the pool
+                    raise
+                self._release_driver(driver)
+                return page_source
             else:
-                headers = {'User-Agent': self.user_agent}
-                response = requests.get(url, headers=headers, timeout=self.timeout)
-                response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-                return response.text
+                return self._get_revalidated(url, 'text', lambda response: response.text)
+        except requests.exceptions.RequestException as e:
+            logger.error("HTTP request failed for %s: %s", url, e)
+            return None
+        except Exception as e:
+            logger.error("Error fetching content from %s: %s", url, e)
+            return None
+
+    def _hash_response(self, response):
+        """Returns the SHA256 hex digest of a streamed response body."""
+        hasher = hashlib.sha256()
+        for chunk in response.iter_content(chunk_size=HASH_CHUNK_SIZE):
+            hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def _hash_response_text(self, response):
+        """
+        Returns the SHA256 hex digest of a streamed response's text encoded as UTF-8, i.e. the
+        hash ChangeDetector computes from response.text, or None for an empty body. The body is
+        decoded incrementally with the charset requests would use, so it is never held whole.
+        """
+        try:
+            decoder = codecs.getincrementaldecoder(response.encoding)(errors='replace') if response.encoding else None
+        except LookupError:
+            decoder = None
+        if decoder is None:
+            # No usable charset: requests guesses one from the whole body, so let it
+            text = response.text
+            return hashlib.sha256(text.encode('utf-8')).hexdigest() if text else None
+
+        hasher = hashlib.sha256()
+        empty = True
+        for chunk in response.iter_content(chunk_size=HASH_CHUNK_SIZE):
+            if chunk:
+                empty = False
+                hasher.update(decoder.decode(chunk).encode('utf-8'))
+        hasher.update(decoder.decode(b'', final=True).encode('utf-8'))
+        return None if empty else hasher.hexdigest()
+
+    def get_content_hash(self, url):
+        """
+        Downloads a page and returns the SHA256 hash of its text, decoding and hashing it as
+        it streams in so the body is never held in memory. Matches hashing fetch_content()'s text.
+        """
+        try:
+            return self._get_revalidated(url, 'text_sha256', self._hash_response_text, stream=True)
         except requests.exceptions.RequestException as e:
-            logger.error(f"HTTP request failed for {url}: {e}")
+            logger.error("HTTP request failed for %s: %s", url, e)
             return None
         except Exception as e:
-            logger.error(f"Error fetching content from {url}: {e}")
+            logger.error("Error hashing content from %s: %s", url, e)
             return None
 
     def get_pdf_hash(self, pdf_url):
         """
         Downloads a PDF and returns its SHA256 hash.
         """
-        logger.info(f"Fetching PDF from: {pdf_url} to calculate hash.")
+        logger.info("Fetching PDF from: %s to calculate hash.", pdf_url)
         try:
-            headers = {'User-Agent': self.user_agent}
-            response = requests.get(pdf_url, headers=headers, timeout=self.timeout, stream=True)
-            response.raise_for_status()
-
-            hasher = hashlib.sha256()
-            for chunk in response.iter_content(chunk_size=8192):
-                hasher.update(chunk)
-            
-            pdf_hash = hasher.hexdigest()
-            logger.info(f"Successfully calculated PDF hash for {pdf_url}: {pdf_hash[:10]}...")
+            pdf_hash = self._get_revalidated(pdf_url, 'sha256', self._hash_response, stream=True)
+            logger.info("Successfully calculated PDF hash for %s: %s...", pdf_url, pdf_hash[:10])
             return pdf_hash
         except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to download PDF from {pdf_url}: {e}")
+            logger.error("Failed to download PDF from %s: %s", pdf_url, e)
             return None
         except Exception as e:
-            logger.error(f"Error processing PDF from {pdf_url}: {e}")
+            logger.error("Error processing PDF from %s: %s", pdf_url, e)
             return None
\ No newline at end of file
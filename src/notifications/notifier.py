@@ -1,19 +1,242 @@
+import hashlib
 import smtplib
 import ssl
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+from string import Template
 from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 
 logger = logging.getLogger(__name__)
 
+# Alert deliveries (one per change per channel) run on a separate thread pool per channel,
+# so a channel waiting on its rate limit never holds up the others. Emails share one SMTP
+# connection and are sent one at a time anyway.
+NOTIFICATION_WORKERS = {'email': 1, 'slack': 4, 'teams': 4}
+
+SEVERITY_COLORS = {'critical': 'red', 'high': 'orange', 'medium': 'yellow'}
+
+# Alert message templates, built once at import rather than per alert
+ALERT_EMAIL_TEMPLATE = Template("""
+        <html>
+        <body>
+            <p>A change has been detected for the following payroll form:</p>
+            <ul>
+                <li><strong>Agency:</strong> $agency_name ($agency_abbreviation)</li>
+                <li><strong>Form Name:</strong> $form_name</li>
+                <li><strong>Form Title:</strong> $form_title</li>
+                <li><strong>Change Timestamp:</strong> $timestamp</li>
+                <li><strong>Severity:</strong> <span style="color: $severity_color; font-weight: bold;">$severity</span></li>
+                <li><strong>Details:</strong> $change_details</li>
+                <li><strong>Form URL:</strong> <a href="$form_url">$form_url</a></li>
+                $direct_form_url_item
+                $instructions_url_item
+            </ul>
+            <p>Please review the change and assess its impact.</p>
+            <p>This is an automated notification from the Payroll Monitoring System.</p>
+        </body>
+        </html>
+        """)
+ALERT_PLAIN_TEMPLATE = Template(
+    "🚨 Payroll Form Change Detected!\n"
+    "Agency: $agency_name ($agency_abbreviation)\n"
+    "Form: $form_name - $form_title\n"
+    "Timestamp: $timestamp\n"
+    "Severity: $severity\n"
+    "Details: $change_details\n"
+    "URL: $form_url"
+)
+DIRECT_FORM_URL_ITEM = Template('<li><strong>Direct Form URL:</strong> <a href="$url">$url</a></li>')
+INSTRUCTIONS_URL_ITEM = Template('<li><strong>Instructions URL:</strong> <a href="$url">$url</a></li>')
+
+# Alerts identical to one sent within this many seconds are suppressed (overridable with
+# notification_settings.dedupe_ttl_seconds)
+DEFAULT_ALERT_DEDUPE_TTL = 2 * 60 * 60
+
+class _RecentAlerts:
+    """
+    Thread-safe, bounded record of recently sent alert keys with their send times.
+    Module-level so that back-to-back or overlapping monitoring runs in one process share it.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._sent_at = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, key, ttl):
+        """Records key as sent now and returns True, or returns False if it was sent within ttl."""
+        now = time.monotonic()
+        with self._lock:
+            sent_at = self._sent_at.get(key)
+            if sent_at is not None and now - sent_at < ttl:
+                return False
+            self._sent_at[key] = now
+            self._sent_at.move_to_end(key)
+            if len(self._sent_at) > self.maxsize:
+                self._sent_at.popitem(last=False)
+            return True
+
+    def release(self, key):
+        """Forgets a claim, so the next alert with this key is sent."""
+        with self._lock:
+            self._sent_at.pop(key, None)
+
+    def release_unless_delivered(self, key, futures):
+        """Releases key once all of an alert's delivery futures finish without any returning True."""
+        if not futures:
+            self.release(key)
+            return
+        remaining = [len(futures)]
+        remaining_lock = threading.Lock()
+
+        def on_done(_):
+            with remaining_lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            if not any(future.exception() is None and future.result() for future in futures):
+                logger.warning("Alert delivery failed on every channel; a repeat of it will not be suppressed as a duplicate.")
+                self.release(key)
+
+        for future in futures:
+            future.add_done_callback(on_done)
+
+_recent_alerts = _RecentAlerts(maxsize=4096)
+
+# Default per-channel send rates (messages per minute), overridable with
+# notification_settings.<channel>.max_per_minute. Slack allows about one message per second
+# per webhook; email is left unthrottled unless configured.
+DEFAULT_MAX_PER_MINUTE = {'slack': 60, 'teams': 60, 'email': None}
+
+class _RateLimiter:
+    """
+    Spaces calls to at most per_minute evenly over time, making callers wait for their slot
+    rather than dropping the message. Shared per channel across Notifier instances, since the
+    limits belong to the webhook or mail server, not to one monitoring run.
+    """
+    _by_channel = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_channel(cls, channel, per_minute):
+        """Returns the channel's shared limiter, or None when per_minute is unset (unlimited)."""
+        if not per_minute:
+            return None
+        with cls._registry_lock:
+            limiter = cls._by_channel.get(channel)
+            if limiter is None or limiter.interval != 60.0 / per_minute:
+                limiter = cls._by_channel[channel] = cls(per_minute)
+            return limiter
+
+    def wait(self):
+        """Blocks until the caller's slot comes up."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
 class Notifier:
     def __init__(self, config_loader):
         self.config_loader = config_loader
         self.notification_settings = self.config_loader.get_setting('notification_settings')
+        self.dedupe_ttl = self.notification_settings.get('dedupe_ttl_seconds', DEFAULT_ALERT_DEDUPE_TTL)
+        # Which alert channels are on, resolved once so disabled channels' messages are never built
+        email_config = self.notification_settings.get('email', {})
+        self._email_to = email_config.get('to_addresses', []) if email_config.get('enabled') else []
+        self._slack_on = bool(self.notification_settings.get('slack', {}).get('enabled'))
+        self._teams_on = bool(self.notification_settings.get('teams', {}).get('enabled'))
+        # Bursts (e.g. an agency redesigning every form at once) are paced to each channel's rate
+        self._rate_limiters = {
+            channel: _RateLimiter.for_channel(
+                channel, self.notification_settings.get(channel, {}).get('max_per_minute', default_rate))
+            for channel, default_rate in DEFAULT_MAX_PER_MINUTE.items()
+        }
+        # Webhook POSTs share one session so repeat alerts reuse the TLS connection. Its pool
+        # holds a connection per delivery thread. POSTs aren't idempotent, so only failures where
+        # the message certainly wasn't accepted are retried: connection errors and 429 (after its
+        # Retry-After). Read timeouts and 5xx may follow a delivered post and aren't retried.
+        self.session = requests.Session()
+        retry = Retry(total=3, connect=3, read=0, other=0, status=3, backoff_factor=0.3,
+                      status_forcelist=(429,), allowed_methods=frozenset({'POST'}),
+                      respect_retry_after_header=True)
+        self.session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=max(NOTIFICATION_WORKERS.values()),
+                                                   max_retries=retry))
+        self._executors = {
+            channel: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'notifier-{channel}')
+            for channel, workers in NOTIFICATION_WORKERS.items()
+        }
+        # One authenticated SMTP connection is kept open and shared by every email this notifier
+        # sends, so the TLS handshake and login happen once rather than per alert.
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
         logger.info("Notifier initialized.")
 
+    def close(self):
+        """Waits for pending deliveries, then releases the worker threads, HTTP session and SMTP connection."""
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        self.session.close()
+        with self._smtp_lock:
+            if self._smtp is not None:
+                try:
+                    self._smtp.quit()
+                except smtplib.SMTPException:
+                    pass
+                self._smtp = None
+
+    def _get_smtp(self, smtp_server, smtp_port, username, password):
+        """Returns the open SMTP connection if it still answers NOOP, else logs in on a new one."""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp.close()
+            self._smtp = None
+
+        # Implicit TLS (SMTPS, usually port 465) negotiates TLS in the connect itself, saving
+        # the plaintext EHLO/STARTTLS round trips of a submission-port (587) connection
+        use_ssl = self.notification_settings.get('email', {}).get('use_ssl')
+        if use_ssl:
+            server = smtplib.SMTP_SSL(smtp_server, smtp_port, context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(smtp_server, smtp_port)
+        try:
+            if not use_ssl:
+                server.starttls(context=ssl.create_default_context())
+            server.login(username, password)
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        return server
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _wait_for_rate_limit(self, channel):
+        limiter = self._rate_limiters.get(channel)
+        if limiter is not None:
+            limiter.wait()
+
     def _send_email(self, subject, body, to_addresses):
         """Sends an email notification."""
         email_config = self.notification_settings.get('email', {})
@@ -31,20 +254,26 @@ class Notifier:
             logger.error("Missing email configuration or credentials. Cannot send email.")
             return False
 
-        msg = MIMEMultipart("alternative")
+        # The body is the only part, so it's sent as a single HTML message rather than a multipart one
+        msg = MIMEText(body, "html", "utf-8")
         msg["Subject"] = subject
         msg["From"] = from_address
         msg["To"] = ", ".join(to_addresses)
 
-        # Attach HTML body
-        msg.attach(MIMEText(body, "html"))
-
-        context = ssl.create_default_context()
         try:
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls(context=context)
-                server.login(username, password)
-                server.sendmail(from_address, to_addresses, msg.as_string())
+            # The shared connection carries one message at a time
+            message = msg.as_string()
+            self._wait_for_rate_limit('email')
+            with self._smtp_lock:
+                server = self._get_smtp(smtp_server, smtp_port, username, password)
+                try:
+                    server.sendmail(from_address, to_addresses, message)
+                except smtplib.SMTPServerDisconnected:
+                    # The server can drop an idle connection between the NOOP and the send;
+                    # reconnect once and retry rather than losing the alert.
+                    self._smtp = None
+                    server = self._get_smtp(smtp_server, smtp_port, username, password)
+                    server.sendmail(from_address, to_addresses, message)
             logger.info(f"Email sent successfully to {', '.join(to_addresses)}")
             return True
         except Exception as e:
@@ -67,8 +296,9 @@ class Notifier:
             "text": message,
             "channel": slack_config.get('channel')
         }
+        self._wait_for_rate_limit('slack')
         try:
-            response = requests.post(webhook_url, json=payload, timeout=10)
+            response = self.session.post(webhook_url, json=payload, timeout=10)
             response.raise_for_status()
             logger.info("Slack notification sent successfully.")
             return True
@@ -92,8 +322,9 @@ class Notifier:
         payload = {
             "text": message
         }
+        self._wait_for_rate_limit('teams')
         try:
-            response = requests.post(webhook_url, json=payload, timeout=10)
+            response = self.session.post(webhook_url, json=payload, timeout=10)
             response.raise_for_status()
             logger.info("Teams notification sent successfully.")
             return True
@@ -102,52 +333,80 @@ class Notifier:
             return False
 
     def send_alert(self, change):
-        """Sends an alert for a detected change."""
-        subject = f"🚨 Payroll Form Change Detected: {change.form.name} ({change.form.agency.abbreviation})"
-        
-        # Basic HTML body for email
-        email_body = f"""
-        <html>
-        <body>
-            <p>A change has been detected for the following payroll form:</p>
-            <ul>
-                <li><strong>Agency:</strong> {change.form.agency.name} ({change.form.agency.abbreviation})</li>
-                <li><strong>Form Name:</strong> {change.form.name}</li>
-                <li><strong>Form Title:</strong> {change.form.title}</li>
-                <li><strong>Change Timestamp:</strong> {change.timestamp.strftime('%Y-%m-%d %H:%M:%S UTC')}</li>
-                <li><strong>Severity:</strong> <span style="color: {'red' if change.severity == 'critical' else 'orange' if change.severity == 'high' else 'yellow' if change.severity == 'medium' else 'gray'}; font-weight: bold;">{change.severity.upper()}</span></li>
-                <li><strong>Details:</strong> {change.change_details}</li>
-                <li><strong>Form URL:</strong> <a href="{change.form.url}">{change.form.url}</a></li>
-                {f'<li><strong>Direct Form URL:</strong> <a href="{change.form.form_url}">{change.form.form_url}</a></li>' if change.form.form_url else ''}
-                {f'<li><strong>Instructions URL:</strong> <a href="{change.form.instructions_url}">{change.form.instructions_url}</a></li>' if change.form.instructions_url else ''}
-            </ul>
-            <p>Please review the change and assess its impact.</p>
-            <p>This is an automated notification from the Payroll Monitoring System.</p>
-        </body>
-        </html>
+        """Sends an alert for a detected change and waits for it to be delivered."""
+        wait(self.send_alerts([change]))
+
+    def send_alerts(self, changes):
+        """
+        Queues alerts for several changes, delivering to every channel concurrently in the
+        background, and returns the delivery futures without waiting on the network.
+        Each channel logs its own failures; close() waits for anything still pending.
         """
+        if not (self._email_to or self._slack_on or self._teams_on):
+            return []
+        futures = []
+        for change in changes:
+            key = self._claim_alert(change)
+            if key is None:
+                continue
+            # Messages are built here, on the caller's thread, since they read ORM relationships
+            change_futures = [
+                self._executors[channel].submit(delivery) for channel, delivery in self._alert_deliveries(change)
+            ]
+            # The claim only sticks if some channel delivers, so a failed alert isn't suppressed
+            _recent_alerts.release_unless_delivered(key, change_futures)
+            futures.extend(change_futures)
+        return futures
 
-        # Plain text message for Slack/Teams
-        plain_message = (
-            f"🚨 Payroll Form Change Detected!\n"
-            f"Agency: {change.form.agency.name} ({change.form.agency.abbreviation})\n"
-            f"Form: {change.form.name} - {change.form.title}\n"
-            f"Timestamp: {change.timestamp.strftime('%Y-%m-%d %H:%M:%S UTC')}\n"
-            f"Severity: {change.severity.upper()}\n"
-            f"Details: {change.change_details}\n"
-            f"URL: {change.form.url}"
-        )
-
-        # Send to configured channels
-        to_addresses = self.notification_settings.get('email', {}).get('to_addresses', [])
-        if to_addresses:
-            self._send_email(subject, email_body, to_addresses)
-        
-        if self.notification_settings.get('slack', {}).get('enabled'):
-            self._send_slack_webhook(plain_message)
-        
-        if self.notification_settings.get('teams', {}).get('enabled'):
-            self._send_teams_webhook(plain_message)
+    def _claim_alert(self, change):
+        """
+        Returns the dedupe key claimed for a change's alert, or None if the same alert (form,
+        new content hash, severity) already went out within dedupe_ttl. The form's last_hash
+        is the hash that triggered the change, so a later change to the same form still alerts.
+        """
+        key = hashlib.md5(f"{change.form_id}|{change.form.last_hash}|{change.severity}".encode('utf-8')).hexdigest()
+        if _recent_alerts.claim(key, self.dedupe_ttl):
+            return key
+        logger.info("Suppressing duplicate alert for form %s sent within the last %ss.", change.form_id, self.dedupe_ttl)
+        return None
+
+    def _alert_deliveries(self, change):
+        """Returns (channel, callable) pairs, one per configured channel, that send the alert for a change."""
+        form = change.form
+        agency = form.agency
+        subject = f"🚨 Payroll Form Change Detected: {form.name} ({agency.abbreviation})"
+
+        # Fields shared by the email and chat templates, computed once per change
+        fields = {
+            'agency_name': agency.name,
+            'agency_abbreviation': agency.abbreviation,
+            'form_name': form.name,
+            'form_title': form.title,
+            'timestamp': change.timestamp.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            'severity': change.severity.upper(),
+            'change_details': change.change_details,
+            'form_url': form.url
+        }
+
+        deliveries = []
+        if self._email_to:
+            # Basic HTML body for email
+            email_body = ALERT_EMAIL_TEMPLATE.substitute(
+                fields,
+                severity_color=SEVERITY_COLORS.get(change.severity, 'gray'),
+                direct_form_url_item=DIRECT_FORM_URL_ITEM.substitute(url=form.form_url) if form.form_url else '',
+                instructions_url_item=INSTRUCTIONS_URL_ITEM.substitute(url=form.instructions_url) if form.instructions_url else ''
+            )
+            deliveries.append(('email', partial(self._send_email, subject, email_body, self._email_to)))
+
+        if self._slack_on or self._teams_on:
+            # Plain text message for Slack/Teams
+            plain_message = ALERT_PLAIN_TEMPLATE.substitute(fields)
+            if self._slack_on:
+                deliveries.append(('slack', partial(self._send_slack_webhook, plain_message)))
+            if self._teams_on:
+                deliveries.append(('teams', partial(self._send_teams_webhook, plain_message)))
+        return deliveries
 
     def test_notifications(self):
         """Sends a test notification to all configured channels."""
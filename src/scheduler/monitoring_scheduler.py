@@ -1,4 +1,5 @@
 import logging
+import random
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime, timedelta
@@ -8,11 +9,26 @@ from src.database.models import Form
 
 logger = logging.getLogger(__name__)
 
+# IntervalTrigger arguments for each supported check_frequency
+FREQUENCY_INTERVALS = {
+    'daily': {'days': 1},
+    'weekly': {'weeks': 1},
+    'monthly': {'weeks': 4}, # Approx monthly
+}
+
+# First runs after startup are spread over this many seconds so jobs don't all hit
+# the scraper pool, database and SMTP server at the same moment
+JOB_START_JITTER_SECONDS = 60
+
+# A job that is still running, or missed its slot (e.g. while the process was paused), runs
+# once when it can rather than piling up overlapping or back-to-back catch-up runs
+JOB_DEFAULTS = {'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 3600}
+
 class MonitoringScheduler:
     def __init__(self, config_loader, monitor_function):
         self.config_loader = config_loader
-        self.monitor_function = monitor_function # This function will be called by jobs (e.g., monitor_all_forms)
-        self.scheduler = BackgroundScheduler()
+        self.monitor_function = monitor_function # Called by jobs with a list of form ids (e.g., monitor_all_forms)
+        self.scheduler = BackgroundScheduler(job_defaults=JOB_DEFAULTS)
         self._is_running = False
         logger.info("MonitoringScheduler initialized.")
 
@@ -46,46 +62,42 @@ class MonitoringScheduler:
         self.scheduler.remove_all_jobs()
 
         with db_session() as session:
-            forms = session.query(Form).all()
-            if not forms:
-                logger.warning("No forms found in the database. Cannot add specific monitoring jobs.")
-                logger.info("Adding a default daily monitoring job as a fallback.")
-                self.scheduler.add_job(
-                    self.monitor_function, 
-                    'interval', 
-                    days=1, 
-                    id='default_daily_monitor', 
-                    replace_existing=True,
-                    next_run_time=datetime.now() + timedelta(seconds=10) # Run shortly after start
-                )
-                return
+            forms = session.query(Form.id, Form.name, Form.check_frequency).all()
+        if not forms:
+            logger.warning("No forms found in the database. Cannot add specific monitoring jobs.")
+            logger.info("Adding a default daily monitoring job as a fallback.")
+            self.scheduler.add_job(
+                self.monitor_function, 
+                'interval', 
+                days=1, 
+                id='default_daily_monitor', 
+                replace_existing=True,
+                next_run_time=datetime.now() + timedelta(seconds=10) # Run shortly after start
+            )
+            return
 
-            for form in forms:
-                job_id = f"form_monitor_{form.id}"
-                frequency = form.check_frequency.lower() if form.check_frequency else 'weekly' # Default to weekly if not set
+        # One job per frequency, each monitoring just its own forms in a single batched run.
+        # (A job per form that re-ran every form would scrape everything N times per period.)
+        form_ids_by_frequency = {}
+        for form in forms:
+            frequency = form.check_frequency.lower() if form.check_frequency else 'weekly' # Default to weekly if not set
+            if frequency not in FREQUENCY_INTERVALS:
+                logger.warning(f"Unknown frequency '{frequency}' for form {form.name}. Defaulting to weekly.")
+                frequency = 'weekly'
+            form_ids_by_frequency.setdefault(frequency, []).append(form.id)
 
-                if frequency == 'daily':
-                    trigger = IntervalTrigger(days=1)
-                elif frequency == 'weekly':
-                    trigger = IntervalTrigger(weeks=1)
-                elif frequency == 'monthly':
-                    trigger = IntervalTrigger(weeks=4) # Approx monthly
-                else:
-                    logger.warning(f"Unknown frequency '{frequency}' for form {form.name}. Defaulting to weekly.")
-                    trigger = IntervalTrigger(weeks=1)
-                
-                # Schedule the job to run the monitor_all_forms function
-                # For more granular control, monitor_function could be a wrapper that takes form.id
-                # For now, monitor_all_forms will iterate through all forms.
-                self.scheduler.add_job(
-                    self.monitor_function, 
-                    trigger, 
-                    id=job_id, 
-                    replace_existing=True,
-                    # Run the first job shortly after startup to ensure initial check
-                    next_run_time=datetime.now() + timedelta(seconds=5) 
-                )
-                logger.info(f"Scheduled '{form.name}' ({form.id}) to run {frequency} with job ID: {job_id}")
+        for frequency, form_ids in form_ids_by_frequency.items():
+            job_id = f"{frequency}_monitor"
+            self.scheduler.add_job(
+                self.monitor_function, 
+                IntervalTrigger(**FREQUENCY_INTERVALS[frequency]), 
+                args=[form_ids],
+                id=job_id, 
+                replace_existing=True,
+                # Run the first job shortly after startup to ensure initial check
+                next_run_time=datetime.now() + timedelta(seconds=random.uniform(5, 5 + JOB_START_JITTER_SECONDS))
+            )
+            logger.info(f"Scheduled {len(form_ids)} forms to run {frequency} with job ID: {job_id}")
         
         logger.info(f"Total jobs scheduled: {len(self.scheduler.get_jobs())}")
 
@@ -0,0 +1,63 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    A small thread-safe in-process cache whose entries expire after a time-to-live.
+    Holds at most maxsize entries, evicting the least recently used first.
+    """
+
+    def __init__(self, default_ttl=30, maxsize=256):
+        self.default_ttl = default_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key, compute, ttl=None, cache_if=None):
+        """
+        Returns the cached value for key, calling compute() to (re)populate it
+        if it is missing or has expired. When cache_if is given, a computed value
+        is only stored if cache_if(value) is true.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        # Computed outside the lock so a slow query doesn't block readers of other keys
+        value = compute()
+        if cache_if is not None and not cache_if(value):
+            return value
+        ttl = ttl if ttl is not None else self.default_ttl
+        with self._lock:
+            now = time.monotonic()
+            self._prune_expired(now)
+            self._entries[key] = (now + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        logger.debug("Cached '%s' for %ss", key, ttl)
+        return value
+
+    def _prune_expired(self, now):
+        # Called with the lock held; expired keys would otherwise linger until evicted by size
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def invalidate(self, key=None):
+        """Drops one key, or every entry when key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
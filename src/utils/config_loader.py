@@ -1,18 +1,67 @@
 import yaml
 import os
+import re
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 import logging
 
+try:
+    # libyaml-backed loader; much faster than the pure-Python SafeLoader
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 logger = logging.getLogger(__name__)
 
+# ${VAR} references in config strings, either the whole value or embedded (e.g. "${DATA_DIR}/forms")
+ENV_PLACEHOLDER_PATTERN = re.compile(r'\$\{([^}]+)\}')
+
+# Short string values (frequencies, abbreviations, names) repeat across many entries;
+# interning them keeps one object per distinct value
+INTERN_MAX_LENGTH = 64
+
+@dataclass(frozen=True)
+class FormConfig:
+    """A form entry from agencies.yaml."""
+    name: str
+    url: str
+    title: Optional[str] = None
+    form_url: Optional[str] = None
+    instructions_url: Optional[str] = None
+    check_frequency: Optional[str] = None
+    contact_email: Optional[str] = None
+
+@dataclass(frozen=True)
+class AgencyConfig:
+    """A federal or state agency entry from agencies.yaml, with its forms."""
+    key: str
+    kind: str # 'federal' or 'state'
+    name: str
+    abbreviation: Optional[str] = None
+    base_url: Optional[str] = None
+    prevailing_wage_url: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    forms: Tuple[FormConfig, ...] = ()
+
 class ConfigLoader:
     _instance = None
     _config = None
+    _agencies = ()
+    _instance_lock = threading.Lock()
 
     def __new__(cls):
+        # Double-checked so concurrent first calls (e.g. from scheduler and request threads)
+        # parse the YAML once and never see a half-loaded instance
         if cls._instance is None:
-            cls._instance = super(ConfigLoader, cls).__new__(cls)
-            cls._instance._load_config()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super(ConfigLoader, cls).__new__(cls)
+                    instance._load_config()
+                    cls._instance = instance
         return cls._instance
 
     def _load_config(self):
@@ -21,10 +70,18 @@ class ConfigLoader:
         
         config_path = os.path.join(os.path.dirname(__file__), '../../config/agencies.yaml')
         try:
-            with open(config_path, 'r') as f:
-                ConfigLoader._config = yaml.safe_load(f)
+            # Read in one sized os.read and handed to the parser as a single bytes buffer;
+            # it detects the encoding itself, so no file object or text-decoding layer is needed
+            fd = os.open(config_path, os.O_RDONLY)
+            try:
+                data = os.read(fd, os.fstat(fd).st_size)
+            finally:
+                os.close(fd)
+            ConfigLoader._config = yaml.load(data, Loader=SafeLoader)
             logger.info(f"Configuration loaded from {config_path}")
-            self._process_env_variables()
+            # Without a single "${" in the file there is nothing to substitute, and the walk
+            # only needs to intern strings
+            self._process_env_variables(has_placeholders=b'${' in data)
         except FileNotFoundError:
             logger.error(f"Configuration file not found at {config_path}")
             ConfigLoader._config = {}
@@ -34,35 +91,98 @@ class ConfigLoader:
         except Exception as e:
             logger.error(f"An unexpected error occurred while loading config: {e}")
             ConfigLoader._config = {}
+        try:
+            ConfigLoader._agencies = self._build_agencies()
+        except (AttributeError, KeyError, TypeError) as e:
+            logger.error(f"Invalid agency entry in configuration: {e}")
+            ConfigLoader._agencies = ()
 
-    def _process_env_variables(self):
-        """Replaces placeholder values in config with environment variables."""
+    def _build_agencies(self):
+        """
+        Converts the federal and state sections of the config into AgencyConfig tuples.
+        An invalid agency or form entry is logged and skipped rather than dropping the rest.
+        """
+        default_frequency = self.get_setting('monitoring_settings.default_check_frequency')
+        agencies = []
+        for section, kind in (('federal', 'federal'), ('states', 'state')):
+            for agency_key, agency_data in (ConfigLoader._config.get(section) or {}).items():
+                try:
+                    agencies.append(self._build_agency(agency_key, kind, agency_data, default_frequency))
+                except (AttributeError, KeyError, TypeError) as e:
+                    logger.error(f"Skipping invalid agency entry '{agency_key}' in configuration: {e!r}")
+        return tuple(agencies)
+
+    def _build_agency(self, agency_key, kind, agency_data, default_frequency):
+        """Builds one AgencyConfig, skipping its invalid forms; raises if the agency entry itself is invalid."""
+        contact = agency_data.get('contact') or {}
+        forms = []
+        for form_data in agency_data.get('forms') or []:
+            try:
+                forms.append(FormConfig(
+                    name=form_data['name'],
+                    url=form_data['url'],
+                    title=form_data.get('title'),
+                    form_url=form_data.get('form_url'),
+                    instructions_url=form_data.get('instructions_url'),
+                    check_frequency=form_data.get('check_frequency', default_frequency),
+                    contact_email=form_data.get('contact_email')
+                ))
+            except (AttributeError, KeyError, TypeError) as e:
+                logger.error(f"Skipping invalid form entry for agency '{agency_key}' in configuration: {e!r}")
+        # Only state agencies are loaded with an abbreviation and prevailing wage URL
+        is_state = kind == 'state'
+        return AgencyConfig(
+            key=agency_key,
+            kind=kind,
+            name=agency_data['name'],
+            abbreviation=agency_data.get('abbreviation') if is_state else None,
+            base_url=agency_data.get('base_url'),
+            prevailing_wage_url=agency_data.get('prevailing_wage_url') if is_state else None,
+            phone=contact.get('phone'),
+            email=contact.get('email'),
+            forms=tuple(forms)
+        )
+
+    def _process_env_variables(self, has_placeholders=True):
+        """Replaces placeholder values in config with environment variables and interns short strings."""
         if not ConfigLoader._config:
             return
 
-        # Recursively replace placeholders in dictionaries and lists
-        def replace_placeholders(item):
-            if isinstance(item, dict):
-                for key, value in item.items():
-                    item[key] = replace_placeholders(value)
-            elif isinstance(item, list):
-                item = [replace_placeholders(elem) for elem in item]
-            elif isinstance(item, str) and item.startswith('${') and item.endswith('}'):
-                env_var_name = item[2:-1]
-                env_value = os.getenv(env_var_name)
-                if env_value is not None:
-                    logger.debug(f"Replacing config placeholder {item} with environment variable {env_var_name}")
-                    return env_value
-                else:
-                    logger.warning(f"Environment variable {env_var_name} not found for config placeholder {item}")
-            return item
-        
-        ConfigLoader._config = replace_placeholders(ConfigLoader._config)
+        environ = os.environ
+
+        def resolve(match):
+            env_var_name = match.group(1)
+            env_value = environ.get(env_var_name)
+            if env_value is None:
+                logger.warning("Environment variable %s not found for config placeholder %s", env_var_name, match.group(0))
+                return match.group(0)
+            logger.debug("Replacing config placeholder %s with environment variable %s", match.group(0), env_var_name)
+            return env_value
+
+        # Walk the tree with an explicit stack, replacing placeholders and interning short
+        # strings in place; containers and other values are left untouched rather than rebuilt
+        substitute = ENV_PLACEHOLDER_PATTERN.sub
+        intern = sys.intern
+        stack = [ConfigLoader._config]
+        while stack:
+            node = stack.pop()
+            entries = node.items() if isinstance(node, dict) else enumerate(node)
+            for key, value in entries:
+                if isinstance(value, (dict, list)):
+                    stack.append(value)
+                elif isinstance(value, str):
+                    if has_placeholders and '${' in value:
+                        value = substitute(resolve, value)
+                    node[key] = intern(value) if len(value) < INTERN_MAX_LENGTH else value
 
     def get_config(self):
         """Returns the entire loaded configuration."""
         return ConfigLoader._config
 
+    def get_agencies(self):
+        """Returns the configured agencies as a tuple of AgencyConfig, parsed once per process."""
+        return ConfigLoader._agencies
+
     def get_setting(self, key, default=None):
         """Retrieves a specific setting from the configuration."""
         keys = key.split('.')
@@ -0,0 +1,21 @@
+import os
+import sys
+
+import pytest
+
+# Tests import the application the way main.py does, from the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import src.database.connection as connection
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Points the application at a fresh SQLite database for one test."""
+    monkeypatch.setattr(connection, 'DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(connection, 'engine', None)
+    monkeypatch.setattr(connection, 'Session', None)
+    connection.init_db()
+    yield connection
+    connection.Session.remove()
+    connection.engine.dispose()
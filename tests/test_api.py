@@ -0,0 +1,142 @@
+from datetime import datetime
+
+import pytest
+
+from src.api import main as api
+from src.database.models import Agency, Form, Change
+
+
+@pytest.fixture
+def client(db):
+    api.api_cache.invalidate()
+    api._agencies_json.cache_clear()
+    return api.app.test_client()
+
+
+def test_unknown_agency_forms_are_not_cached(client):
+    for agency_id in range(1000, 1010):
+        response = client.get(f'/api/agency/{agency_id}/forms')
+        assert response.status_code == 200 and response.get_json() == []
+    assert len(api.api_cache) == 0
+
+
+def test_agency_forms_are_cached(db, client):
+    with db.db_session() as session:
+        agency = Agency(name='Test Agency', abbreviation='TA')
+        session.add(agency)
+        session.flush()
+        session.add(Form(agency_id=agency.id, name='WH-347', url='https://example.gov'))
+        agency_id = agency.id
+
+    assert [form['name'] for form in client.get(f'/api/agency/{agency_id}/forms').get_json()] == ['WH-347']
+    assert len(api.api_cache) == 1
+
+
+@pytest.fixture
+def monitor_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(api, 'MONITOR_API_TOKEN', 'secret')
+    monkeypatch.setattr(api, '_monitor_future', None)
+    api.set_monitor_function(lambda: calls.append('run'))
+    yield calls
+    api.set_monitor_function(None)
+
+
+@pytest.mark.parametrize('headers', [{}, {'Authorization': 'Bearer wrong'}, {'Authorization': 'secret'}])
+def test_run_immediate_rejects_missing_or_wrong_token(client, monitor_calls, headers):
+    assert client.post('/api/scheduler/run-immediate', headers=headers).status_code == 401
+    assert monitor_calls == []
+
+
+def test_run_immediate_is_closed_without_a_configured_token(client, monitor_calls, monkeypatch):
+    monkeypatch.setattr(api, 'MONITOR_API_TOKEN', None)
+    response = client.post('/api/scheduler/run-immediate', headers={'Authorization': 'Bearer '})
+    assert response.status_code == 401
+
+
+def test_run_immediate_starts_a_run_with_the_token(client, monitor_calls):
+    response = client.post('/api/scheduler/run-immediate', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 202
+    api._monitor_future.result(timeout=5)
+    assert monitor_calls == ['run']
+
+
+def _add_form_with_changes(db, timestamps):
+    with db.db_session() as session:
+        agency = Agency(name='Paged Agency', abbreviation='PA')
+        session.add(agency)
+        session.flush()
+        form = Form(agency_id=agency.id, name='WH-347', url='https://example.gov')
+        session.add(form)
+        session.flush()
+        session.add_all(Change(form_id=form.id, timestamp=timestamp, change_details='Content hash changed.',
+                               severity='medium') for timestamp in timestamps)
+        return form.id
+
+
+def test_form_history_pages_cover_same_timestamp_changes_once(db, client, monkeypatch):
+    timestamp = datetime(2024, 1, 1)
+    form_id = _add_form_with_changes(db, [timestamp] * 5)
+    monkeypatch.setattr(api, 'CHANGES_PAGE_SIZE', 2)
+    rendered = []
+    monkeypatch.setattr(api, 'render_template', lambda template, **context: rendered.append(context) or '')
+
+    for page in (1, 2, 3):
+        assert client.get(f'/form/{form_id}?page={page}').status_code == 200
+    ids = [change['id'] for context in rendered for change in context['changes']]
+    assert sorted(ids) == sorted(set(ids)) and len(ids) == 5
+    assert ids == sorted(ids, reverse=True)
+
+
+def test_changes_keyset_pages_include_same_timestamp_changes_once(db, client):
+    timestamp = datetime(2024, 1, 2)
+    _add_form_with_changes(db, [timestamp] * 4 + [datetime(2024, 1, 1)])
+
+    seen, query = [], 'limit=2'
+    while True:
+        page = client.get(f'/api/changes?{query}').get_json()
+        if not page:
+            break
+        seen += [change['id'] for change in page]
+        query = f"limit=2&before={page[-1]['timestamp']}&before_id={page[-1]['id']}"
+
+    assert seen == [4, 3, 2, 1, 5]
+
+
+@pytest.mark.parametrize('query', ['limit=abc', 'limit=0', 'before_id=x', 'before=yesterday'])
+def test_changes_rejects_invalid_paging_arguments(client, query):
+    assert client.get(f'/api/changes?{query}').status_code == 400
+
+
+def _add_agencies(db, count):
+    # Enough rows that /api/agencies is over COMPRESS_MIN_SIZE and gets compressed
+    with db.db_session() as session:
+        session.add_all(Agency(name=f'Agency {i}', base_url=f'https://agency{i}.example.gov/payroll')
+                        for i in range(count))
+
+
+@pytest.mark.parametrize('path', ['/api/agencies', '/api/stats', '/api/changes'])
+def test_etag_revalidates_with_304(db, client, path):
+    _add_agencies(db, 50)
+    response = client.get(path, headers={'Accept-Encoding': 'br'})
+    etag = response.headers['ETag']
+
+    assert client.get(path, headers={'Accept-Encoding': 'br', 'If-None-Match': etag}).status_code == 304
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_compressed_etag_suffix_is_matched(db, client):
+    _add_agencies(db, 50)
+    response = client.get('/api/agencies', headers={'Accept-Encoding': 'br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.headers['ETag'].endswith(':br"')
+
+    revalidated = client.get('/api/agencies', headers={'Accept-Encoding': 'br', 'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+
+
+def test_streamed_changes_are_not_compressed(db, client):
+    _add_form_with_changes(db, [datetime(2024, 1, 1)] * 50)
+    response = client.get('/api/changes', headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers
+    assert len(response.get_json()) == 50
@@ -0,0 +1,56 @@
+from src.utils import cache
+from src.utils.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_value_is_computed_once_until_it_expires(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    ttl_cache = TTLCache(default_ttl=10)
+    calls = []
+
+    def compute():
+        calls.append(clock.now)
+        return len(calls)
+
+    assert ttl_cache.get_or_set('key', compute) == 1
+    assert ttl_cache.get_or_set('key', compute) == 1
+    clock.now += 11
+    assert ttl_cache.get_or_set('key', compute) == 2
+
+
+def test_least_recently_used_entry_is_evicted_at_maxsize():
+    ttl_cache = TTLCache(default_ttl=60, maxsize=2)
+    ttl_cache.get_or_set('a', lambda: 'a')
+    ttl_cache.get_or_set('b', lambda: 'b')
+    ttl_cache.get_or_set('a', lambda: 'recomputed') # Touch 'a' so 'b' is the oldest
+    ttl_cache.get_or_set('c', lambda: 'c')
+
+    assert len(ttl_cache) == 2
+    assert ttl_cache.get_or_set('a', lambda: 'recomputed') == 'a'
+    assert ttl_cache.get_or_set('b', lambda: 'recomputed') == 'recomputed'
+
+
+def test_expired_entries_are_pruned_on_set(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    ttl_cache = TTLCache(default_ttl=10)
+    for key in range(5):
+        ttl_cache.get_or_set(key, lambda: key)
+    clock.now += 11
+    ttl_cache.get_or_set('fresh', lambda: 'fresh')
+
+    assert len(ttl_cache) == 1
+
+
+def test_values_rejected_by_cache_if_are_not_stored():
+    ttl_cache = TTLCache(default_ttl=60)
+    assert ttl_cache.get_or_set('empty', lambda: b'[]', cache_if=lambda value: value != b'[]') == b'[]'
+    assert len(ttl_cache) == 0
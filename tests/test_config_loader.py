@@ -0,0 +1,80 @@
+import pytest
+
+from src.utils.config_loader import ConfigLoader
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    loader = ConfigLoader()
+    monkeypatch.setattr(ConfigLoader, '_config', {'monitoring_settings': {'default_check_frequency': 'weekly'}})
+    return loader
+
+
+def _use_config(monkeypatch, **sections):
+    config = dict(ConfigLoader._config, **sections)
+    monkeypatch.setattr(ConfigLoader, '_config', config)
+
+
+def test_invalid_entries_are_skipped_without_dropping_the_rest(loader, monkeypatch):
+    _use_config(monkeypatch, federal={
+        'dol': {'name': 'Department of Labor', 'forms': [
+            {'name': 'WH-347', 'url': 'https://dol.gov/wh347'},
+            {'name': 'No URL'},
+        ]},
+        'nameless': {'forms': []},
+    }, states={
+        'alabama': {'name': 'Alabama DOL', 'abbreviation': 'AL', 'forms': [{'url': 'https://al.gov/no-name'}]},
+    })
+
+    agencies = {agency.key: agency for agency in loader._build_agencies()}
+
+    assert set(agencies) == {'dol', 'alabama'}
+    assert [form.name for form in agencies['dol'].forms] == ['WH-347']
+    assert agencies['dol'].forms[0].check_frequency == 'weekly'
+    assert agencies['alabama'].forms == ()
+
+
+def test_only_state_agencies_get_abbreviation_and_prevailing_wage_url(loader, monkeypatch):
+    entry = {'name': 'Agency', 'abbreviation': 'AG', 'prevailing_wage_url': 'https://example.gov/pw'}
+    _use_config(monkeypatch, federal={'fed': dict(entry)}, states={'state': dict(entry, name='State Agency')})
+
+    agencies = {agency.key: agency for agency in loader._build_agencies()}
+
+    assert (agencies['fed'].abbreviation, agencies['fed'].prevailing_wage_url) == (None, None)
+    assert (agencies['state'].abbreviation, agencies['state'].prevailing_wage_url) == ('AG', 'https://example.gov/pw')
+
+
+def test_placeholders_are_resolved_in_place(loader, monkeypatch):
+    monkeypatch.setenv('SMTP_SERVER', 'smtp.example.com')
+    monkeypatch.setenv('DATA_DIR', '/srv/data')
+    monkeypatch.delenv('MISSING_VAR', raising=False)
+    recipients = ['${SMTP_SERVER}', '${MISSING_VAR}']
+    config = {'email': {'smtp_server': '${SMTP_SERVER}', 'to': recipients, 'port': 587},
+              'paths': [{'forms': '${DATA_DIR}/forms'}]}
+    monkeypatch.setattr(ConfigLoader, '_config', config)
+
+    loader._process_env_variables()
+
+    assert config == {'email': {'smtp_server': 'smtp.example.com', 'to': ['smtp.example.com', '${MISSING_VAR}'],
+                                'port': 587},
+                      'paths': [{'forms': '/srv/data/forms'}]}
+    assert config['email']['to'] is recipients # Containers are updated, not rebuilt
+
+
+def test_placeholders_are_left_alone_when_the_file_has_none(loader, monkeypatch):
+    monkeypatch.setenv('SMTP_SERVER', 'smtp.example.com')
+    config = {'smtp_server': '${SMTP_SERVER}'}
+    monkeypatch.setattr(ConfigLoader, '_config', config)
+
+    loader._process_env_variables(has_placeholders=False)
+
+    assert config == {'smtp_server': '${SMTP_SERVER}'}
+
+
+def test_short_strings_are_interned(loader, monkeypatch):
+    config = {'forms': [{'check_frequency': ''.join(['week', 'ly'])}, {'check_frequency': ''.join(['wee', 'kly'])}]}
+    monkeypatch.setattr(ConfigLoader, '_config', config)
+
+    loader._process_env_variables()
+
+    assert config['forms'][0]['check_frequency'] is config['forms'][1]['check_frequency']
@@ -0,0 +1,53 @@
+import sqlite3
+
+from sqlalchemy import inspect
+
+import src.database.connection as connection
+
+# Schema of a database created before the model indexes existed (as data/payroll_monitor.db was)
+LEGACY_SCHEMA = """
+CREATE TABLE agencies (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE, abbreviation VARCHAR,
+    base_url VARCHAR, prevailing_wage_url VARCHAR, phone VARCHAR, email VARCHAR);
+CREATE TABLE forms (id INTEGER PRIMARY KEY, agency_id INTEGER REFERENCES agencies (id), name VARCHAR NOT NULL,
+    title VARCHAR, url VARCHAR NOT NULL, form_url VARCHAR, instructions_url VARCHAR, check_frequency VARCHAR,
+    contact_email VARCHAR, last_hash VARCHAR, last_scraped_at DATETIME);
+CREATE TABLE changes (id INTEGER PRIMARY KEY, form_id INTEGER REFERENCES forms (id), timestamp DATETIME,
+    change_details TEXT, severity VARCHAR, is_reviewed BOOLEAN);
+"""
+
+
+def _init_legacy_db(tmp_path, monkeypatch, rows=''):
+    path = tmp_path / 'legacy.db'
+    with sqlite3.connect(path) as legacy:
+        legacy.executescript(LEGACY_SCHEMA + rows)
+    monkeypatch.setattr(connection, 'DATABASE_URL', f'sqlite:///{path}')
+    monkeypatch.setattr(connection, 'engine', None)
+    monkeypatch.setattr(connection, 'Session', None)
+    connection.init_db()
+    return inspect(connection.engine)
+
+
+def test_init_db_adds_indexes_to_existing_tables(tmp_path, monkeypatch):
+    inspector = _init_legacy_db(tmp_path, monkeypatch)
+    try:
+        assert {index['name'] for index in inspector.get_indexes('changes')} == {'ix_change_form_ts', 'ix_change_ts'}
+        assert 'ix_form_agency_name' in {index['name'] for index in inspector.get_indexes('forms')}
+    finally:
+        connection.engine.dispose()
+
+
+def test_init_db_merges_duplicate_forms_before_adding_unique_index(tmp_path, monkeypatch):
+    rows = """
+    INSERT INTO agencies (id, name) VALUES (1, 'Agency A'), (2, 'Agency B');
+    INSERT INTO forms (id, agency_id, name, url) VALUES
+        (1, 1, 'WH-347', 'u'), (2, 1, 'WH-347', 'u'), (3, 2, 'WH-347', 'u'), (4, 1, 'WH-347', 'u');
+    INSERT INTO changes (id, form_id) VALUES (1, 1), (2, 2), (3, 3), (4, 4);
+    """
+    inspector = _init_legacy_db(tmp_path, monkeypatch, rows)
+    try:
+        assert 'ix_form_agency_name' in {index['name'] for index in inspector.get_indexes('forms')}
+        with connection.engine.connect() as conn:
+            assert conn.exec_driver_sql('SELECT id FROM forms ORDER BY id').scalars().all() == [1, 3]
+            assert conn.exec_driver_sql('SELECT form_id FROM changes ORDER BY id').scalars().all() == [1, 1, 3, 1]
+    finally:
+        connection.engine.dispose()
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import main
+from src.database.models import Agency, Form, Change
+
+
+class RecordingNotifier:
+    def __init__(self):
+        self.alerted_form_ids = []
+
+    def send_alerts(self, changes):
+        self.alerted_form_ids.extend(change.form_id for change in changes)
+        return []
+
+
+def _add_forms(db, count):
+    with db.db_session() as session:
+        agency = Agency(name='Test Agency', abbreviation='TA')
+        session.add(agency)
+        session.flush()
+        session.add_all(Form(agency_id=agency.id, name=f'form {i}', url='https://example.gov', last_hash='old')
+                        for i in range(count))
+        session.flush()
+        return [form_id for form_id, in session.query(Form.id).order_by(Form.id)]
+
+
+def _results(form_ids, bad_form_id=None):
+    now = datetime.utcnow()
+    form_updates = [{'form_id': form_id, 'new_hash': f'new {form_id}', 'scraped_at': now} for form_id in form_ids]
+    new_changes = [
+        {
+            'form_id': form_id,
+            # A value the DateTime column rejects makes this one row fail to insert
+            'timestamp': 'not a datetime' if form_id == bad_form_id else now,
+            'change_details': 'Content hash changed.',
+            'severity': 'medium'
+        }
+        for form_id in form_ids
+    ]
+    return form_updates, new_changes
+
+
+def test_batch_writes_every_form_and_alerts(db):
+    form_ids = _add_forms(db, 3)
+    notifier = RecordingNotifier()
+    form_updates, new_changes = _results(form_ids)
+
+    with db.db_session() as session:
+        main._write_monitoring_batch(session, notifier, form_updates, new_changes)
+
+    with db.db_session() as session:
+        assert dict(session.query(Form.id, Form.last_hash)) == {form_id: f'new {form_id}' for form_id in form_ids}
+        assert sorted(form_id for form_id, in session.query(Change.form_id)) == form_ids
+    assert notifier.alerted_form_ids == form_ids
+    assert form_updates == [] and new_changes == []
+
+
+def test_failed_row_only_loses_its_own_form(db):
+    form_ids = _add_forms(db, 3)
+    bad_form_id = form_ids[1]
+    notifier = RecordingNotifier()
+
+    with db.db_session() as session:
+        main._write_monitoring_batch(session, notifier, *_results(form_ids, bad_form_id=bad_form_id))
+
+    good_form_ids = [form_id for form_id in form_ids if form_id != bad_form_id]
+    with db.db_session() as session:
+        last_hashes = dict(session.query(Form.id, Form.last_hash))
+        assert last_hashes[bad_form_id] == 'old' # Left for the next run to detect again
+        assert all(last_hashes[form_id] == f'new {form_id}' for form_id in good_form_ids)
+        assert sorted(form_id for form_id, in session.query(Change.form_id)) == good_form_ids
+    assert notifier.alerted_form_ids == good_form_ids
@@ -0,0 +1,198 @@
+import http.server
+import threading
+from datetime import datetime
+from itertools import count
+from types import SimpleNamespace
+
+import pytest
+
+import src.notifications.notifier as notifier_module
+from src.notifications.notifier import Notifier
+
+_form_ids = count(1)
+
+
+class _Config:
+    def __init__(self, settings):
+        self.settings = settings
+
+    def get_setting(self, key, default=None):
+        return self.settings
+
+
+def _change(content_hash='hash'):
+    agency = SimpleNamespace(name='Test Agency', abbreviation='TA')
+    form = SimpleNamespace(name='WH-347', title='Payroll', url='https://example.gov', form_url=None,
+                           instructions_url=None, agency=agency, last_hash=content_hash)
+    return SimpleNamespace(form=form, form_id=next(_form_ids), severity='medium', timestamp=datetime.utcnow(),
+                           change_details='Content hash changed.')
+
+
+@pytest.fixture
+def notifier():
+    settings = {
+        'email': {'enabled': True, 'to_addresses': ['ops@example.com']},
+        'slack': {'enabled': True, 'max_per_minute': None},
+        'teams': {'enabled': True, 'max_per_minute': None},
+    }
+    with Notifier(_Config(settings)) as notifier:
+        yield notifier
+
+
+def test_a_blocked_channel_does_not_hold_up_the_others(notifier, monkeypatch):
+    slack_released = threading.Event()
+    delivered = {'email': 0, 'teams': 0}
+    lock = threading.Lock()
+
+    def record(channel):
+        def send(*args):
+            with lock:
+                delivered[channel] += 1
+            return True
+        return send
+
+    # Slack deliveries block, as they would sleeping on a rate limit during a burst
+    monkeypatch.setattr(notifier, '_send_slack_webhook', lambda message: slack_released.wait(5))
+    monkeypatch.setattr(notifier, '_send_email', record('email'))
+    monkeypatch.setattr(notifier, '_send_teams_webhook', record('teams'))
+
+    changes = [_change() for _ in range(3 * notifier_module.NOTIFICATION_WORKERS['slack'])]
+    notifier.send_alerts(changes)
+    try:
+        expected = {'email': len(changes), 'teams': len(changes)}
+        for _ in range(100):
+            with lock:
+                if delivered == expected:
+                    break
+            slack_released.wait(0.05)
+        assert delivered == expected
+    finally:
+        slack_released.set()
+
+
+class _WebhookHandler(http.server.BaseHTTPRequestHandler):
+    # Statuses to answer successive POSTs with; the last one repeats
+    statuses = []
+    posts = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        type(self).posts += 1
+        status = self.statuses[min(self.posts, len(self.statuses)) - 1]
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook(notifier, monkeypatch):
+    monkeypatch.delenv('SLACK_WEBHOOK_URL', raising=False) # Takes precedence over the configured URL
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _WebhookHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    _WebhookHandler.posts = 0
+    # The retrying adapter is mounted for https; use it for the local plain-http server too
+    notifier.session.mount('http://', notifier.session.get_adapter('https://'))
+    notifier.notification_settings['slack']['webhook_url'] = f'http://127.0.0.1:{httpd.server_port}/hook'
+    yield _WebhookHandler
+    httpd.shutdown()
+
+
+def test_webhook_server_error_is_not_retried(notifier, webhook):
+    webhook.statuses = [500]
+    assert notifier._send_slack_webhook('message') is False
+    assert webhook.posts == 1
+
+
+def test_webhook_rate_limit_is_retried(notifier, webhook):
+    webhook.statuses = [429, 200]
+    assert notifier._send_slack_webhook('message') is True
+    assert webhook.posts == 2
+
+
+
+@pytest.fixture
+def sent(notifier, monkeypatch):
+    """Records every delivery made on any channel; deliveries succeed."""
+    sent = []
+    lock = threading.Lock()
+
+    def deliver(*args):
+        with lock:
+            sent.append(args)
+        return True
+
+    for method in ('_send_email', '_send_slack_webhook', '_send_teams_webhook'):
+        monkeypatch.setattr(notifier, method, deliver)
+    return sent
+
+
+def _deliver(notifier, changes):
+    for future in notifier.send_alerts(changes):
+        future.result(timeout=5)
+
+
+def _same_form(change, content_hash):
+    repeat = _change(content_hash)
+    repeat.form_id = change.form_id
+    return repeat
+
+
+def test_repeated_alert_for_the_same_content_is_suppressed(notifier, sent):
+    change = _change('hash-a')
+    _deliver(notifier, [change])
+    assert len(sent) == 3 # One per channel
+
+    _deliver(notifier, [_same_form(change, 'hash-a')])
+
+    assert len(sent) == 3
+
+
+def test_new_content_for_the_same_form_still_alerts(notifier, sent):
+    change = _change('hash-a')
+    _deliver(notifier, [change])
+
+    _deliver(notifier, [_same_form(change, 'hash-b')])
+
+    assert len(sent) == 6
+
+
+def test_alert_failing_on_every_channel_is_not_suppressed(notifier, monkeypatch):
+    for method in ('_send_email', '_send_slack_webhook', '_send_teams_webhook'):
+        monkeypatch.setattr(notifier, method, lambda *args: False)
+    change = _change('hash-a')
+    _deliver(notifier, [change])
+
+    # The claim is released by a done-callback that may run just after the futures resolve
+    for _ in range(100):
+        if notifier._claim_alert(_same_form(change, 'hash-a')) is not None:
+            break
+        threading.Event().wait(0.02)
+    else:
+        pytest.fail('dedupe claim was kept although no channel delivered the alert')
+
+
+def test_rate_limiter_spaces_calls_to_the_channel_rate(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(notifier_module.time, 'monotonic', lambda: clock[0])
+    monkeypatch.setattr(notifier_module.time, 'sleep', sleep)
+    limiter = notifier_module._RateLimiter(per_minute=30) # One call every 2 seconds
+
+    for _ in range(3):
+        limiter.wait()
+
+    assert sleeps == [2.0, 2.0]
+
+
+def test_unset_rate_means_no_limiter():
+    assert notifier_module._RateLimiter.for_channel('email', None) is None
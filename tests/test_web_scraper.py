@@ -0,0 +1,97 @@
+import hashlib
+import http.server
+import threading
+
+import pytest
+import requests
+
+import src.monitors.web_scraper as web_scraper
+from src.monitors.change_detector import ChangeDetector
+
+PAGE = ('<p>Café façade résumé</p>' * 40).encode('utf-8')
+
+# path -> (status, Content-Type)
+ROUTES = {
+    '/no-charset': (200, 'text/html'),
+    '/utf8': (200, 'text/html; charset=utf-8'),
+    '/untyped': (200, 'application/octet-stream'),
+    '/unknown-charset': (200, 'text/html; charset=bogus'),
+    '/missing': (404, 'text/html'),
+    '/unavailable': (503, 'text/html'),
+}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    paths_requested = []
+
+    def do_GET(self):
+        self.paths_requested.append(self.path)
+        status, content_type = ROUTES[self.path]
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope='module')
+def server():
+    httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+
+class _Config:
+    def get_setting(self, key, default=None):
+        return {'retry_attempts': 3, 'timeout_seconds': 5}
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    monkeypatch.setattr(web_scraper, 'HASH_CHUNK_SIZE', 7) # Multi-byte characters straddle chunks
+    monkeypatch.setattr(web_scraper.time, 'sleep', lambda seconds: None) # No retry backoff
+    _Handler.paths_requested.clear()
+    with web_scraper.WebScraper(_Config()) as scraper:
+        yield scraper
+
+
+@pytest.mark.parametrize('path', ['/no-charset', '/utf8', '/untyped', '/unknown-charset'])
+def test_content_hash_matches_hash_of_decoded_text(server, scraper, path):
+    # Stored hashes are ChangeDetector's hash of response.text; the streamed hash must agree
+    expected = ChangeDetector()._calculate_hash(requests.get(server + path).text)
+    assert scraper.get_content_hash(server + path) == expected
+
+
+def test_content_hash_without_charset_differs_from_raw_bytes(server, scraper):
+    # requests decodes undeclared text/html as ISO-8859-1, so this page isn't its UTF-8 bytes
+    assert scraper.get_content_hash(server + '/no-charset') != hashlib.sha256(PAGE).hexdigest()
+
+
+@pytest.fixture
+def closed_responses(monkeypatch):
+    closed = []
+    close = requests.Response.close
+
+    def recording_close(response):
+        closed.append(response.status_code)
+        close(response)
+
+    monkeypatch.setattr(requests.Response, 'close', recording_close)
+    return closed
+
+
+def test_client_error_fails_without_retrying(server, scraper, closed_responses):
+    assert scraper.get_pdf_hash(server + '/missing') is None
+    assert _Handler.paths_requested == ['/missing']
+    assert closed_responses == [404]
+
+
+def test_server_error_is_retried_and_each_response_closed(server, scraper, closed_responses):
+    assert scraper.get_content_hash(server + '/unavailable') is None
+    assert _Handler.paths_requested == ['/unavailable'] * scraper.retry_attempts
+    assert closed_responses == [503] * scraper.retry_attempts